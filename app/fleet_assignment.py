@@ -0,0 +1,151 @@
+"""
+Fleet-wide job assignment so two trucks are never sent to the same job.
+
+Each truck is split into MAX_JOBS identical slots and every slot bids for
+jobs from its truck's candidate list (Bertsekas' auction algorithm with
+epsilon scaling). The value of a job to a truck is ASSIGNMENT_VALUE_MILES
+minus the same score heuristic_scheduler uses, so closer night-access jobs
+are worth more and leaving a slot empty (value 0) always loses to any
+candidate in range.
+
+The auction only limits the number of jobs per truck. Yardage and the
+one-material rule are applied afterwards: each truck keeps its best jobs of
+one material that fit the load (or its single best job if none fit). The
+jobs it drops are auctioned again among the trucks with free slots that
+can still take them, for up to MAX_JOBS rounds.
+"""
+from collections import deque
+
+from heuristic_scheduler import MAX_JOBS, MAX_DISTANCE_MILES, DAY_JOB_PENALTY_MILES, fit_jobs, score_job, starting_load
+
+ASSIGNMENT_VALUE_MILES = MAX_DISTANCE_MILES + DAY_JOB_PENALTY_MILES + 1
+# Final assignment is within (number of slots x epsilon) miles of optimal
+AUCTION_EPSILON = 0.01
+AUCTION_START_EPSILON = 2.0
+AUCTION_EPSILON_FACTOR = 5
+
+
+def _auction_phase(person_objects, person_values, prices, epsilon):
+    """One forward auction pass from an empty assignment, updating prices in place."""
+    owner = [-1] * len(prices)
+    assigned = [-1] * len(person_objects)
+    queue = deque(range(len(person_objects)))
+
+    while queue:
+        person = queue.popleft()
+        best_obj, best, second = -1, float("-inf"), float("-inf")
+        for obj, value in zip(person_objects[person], person_values[person]):
+            net = value - prices[obj]
+            if net > best:
+                best_obj, best, second = obj, net, best
+            elif net > second:
+                second = net
+        if second == float("-inf"):
+            second = best  # only one choice, nothing to outbid
+
+        prices[best_obj] += best - second + epsilon
+
+        previous = owner[best_obj]
+        if previous >= 0:
+            assigned[previous] = -1
+            queue.append(previous)
+        owner[best_obj] = person
+        assigned[person] = best_obj
+
+    return assigned
+
+
+def auction(bidder_objects, bidder_values, num_objects, epsilon=AUCTION_EPSILON):
+    """
+    Maximum-value sparse assignment where bidders and objects may both stay
+    unassigned. bidder_objects[b] / bidder_values[b] are aligned lists of the
+    objects bidder b can take and what each is worth to it.
+    Returns a list with the object assigned to each bidder, or -1.
+
+    The problem is made square so epsilon scaling stays exact: each bidder
+    gets a private "unassigned" object worth 0, and each object gets a
+    stand-in person that takes it when no bidder does, or otherwise takes
+    the freed "unassigned" object of one of the bidders that could have.
+    """
+    num_bidders = len(bidder_objects)
+    person_objects, person_values = [], []
+    takers = [[] for _ in range(num_objects)]
+
+    for bidder, (objects, values) in enumerate(zip(bidder_objects, bidder_values)):
+        dummy = num_objects + bidder
+        person_objects.append(list(objects) + [dummy])
+        person_values.append(list(values) + [0.0])
+        for obj in objects:
+            takers[obj].append(dummy)
+
+    for obj in range(num_objects):
+        person_objects.append([obj] + takers[obj])
+        person_values.append([0.0] * (1 + len(takers[obj])))
+
+    prices = [0.0] * (num_objects + num_bidders)
+    step = AUCTION_START_EPSILON
+    while True:
+        assigned = _auction_phase(person_objects, person_values, prices, max(step, epsilon))
+        if step <= epsilon:
+            break
+        step /= AUCTION_EPSILON_FACTOR
+
+    return [obj if obj < num_objects else -1 for obj in assigned[:num_bidders]]
+
+
+def assign_jobs(trucks, max_jobs=MAX_JOBS, epsilon=AUCTION_EPSILON):
+    """
+    Assign each candidate job to at most one truck across the whole fleet.
+
+    trucks: loader entries with truck_id, material, quantity_left and
+    candidate jobs (each carrying a board-wide job_id plus distance_miles,
+    night_access and bid_qty).
+
+    Returns {truck_id: [job, ...]} ordered by score, best first.
+    """
+    job_ids = sorted({job["job_id"] for truck in trucks for job in truck["jobs"]})
+    column = {job_id: col for col, job_id in enumerate(job_ids)}
+    in_range = [[job for job in truck["jobs"] if job["distance_miles"] <= MAX_DISTANCE_MILES] for truck in trucks]
+
+    result = {truck["truck_id"]: [] for truck in trucks}
+    rejected = {truck["truck_id"]: set() for truck in trucks}  # jobs a truck's trim dropped
+
+    # Jobs dropped when a truck is trimmed to one material and its load go back
+    # up for auction among the trucks that can still take them
+    for _ in range(max_jobs):
+        taken = {job["job_id"] for jobs in result.values() for job in jobs}
+
+        # Sparse truck x job score matrix, one row per free truck slot
+        bidder_objects, bidder_values, bidder_jobs = [], [], []
+        for truck, jobs in zip(trucks, in_range):
+            kept = result[truck["truck_id"]]
+            open_jobs = {
+                column[job["job_id"]]: job for job in jobs
+                if job["job_id"] not in taken
+                and job["job_id"] not in rejected[truck["truck_id"]]
+                and (not kept or job["material"] == kept[0]["material"])
+            }
+            for _ in range(max_jobs - len(kept)):
+                bidder_objects.append(list(open_jobs))
+                bidder_values.append([ASSIGNMENT_VALUE_MILES - score_job(job) for job in open_jobs.values()])
+                bidder_jobs.append((truck["truck_id"], open_jobs))
+
+        assigned = auction(bidder_objects, bidder_values, len(job_ids), epsilon)
+
+        won = {truck_id: [] for truck_id in result}
+        for bidder, obj in enumerate(assigned):
+            if obj >= 0:
+                truck_id, open_jobs = bidder_jobs[bidder]
+                won[truck_id].append(open_jobs[obj])
+        if not any(won.values()):
+            break
+
+        # Respect yardage and the one-material rule the same way heuristic_scheduler does
+        for truck in trucks:
+            truck_id = truck["truck_id"]
+            load, _ = starting_load(truck)
+            jobs = sorted(result[truck_id] + won[truck_id], key=lambda job: (score_job(job), job["name"]))
+            result[truck_id] = fit_jobs(jobs, load, max_jobs) or jobs[:1]
+            rejected[truck_id].update(job["job_id"] for job in jobs if job not in result[truck_id])
+
+    return result
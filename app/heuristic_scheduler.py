@@ -0,0 +1,107 @@
+"""
+Deterministic scheduler that applies the prompt's rules locally:
+  - refill to 40 yards when the truck is empty or has less than 10 yards left
+  - prefer night-access jobs (5 AM start), otherwise 7 AM
+  - only jobs within 40 miles
+  - pick up to 3 jobs of one material without exceeding what's on the truck
+
+Produces the same {"truck", "recommended_jobs"} structure the LLM returns,
+so format_schedule() can consume either.
+"""
+
+TRUCK_CAPACITY_YARDS = 40
+REFILL_BELOW_YARDS = 10
+MAX_DISTANCE_MILES = 40
+MAX_JOBS = 3
+
+NIGHT_START = "5:00 AM"
+DAY_START = "7:00 AM"
+
+# Score is in "miles": a day-only job counts as this much further away
+DAY_JOB_PENALTY_MILES = 15
+# Picks closer than this to the best job left out are a coin toss
+AMBIGUITY_MARGIN_MILES = 1.0
+
+
+def score_job(job):
+    """Lower is better."""
+    return job["distance_miles"] + (0 if job["night_access"] else DAY_JOB_PENALTY_MILES)
+
+
+def starting_load(truck):
+    """Yards on the truck at the first job, after a refill if one is needed."""
+    quantity_left = float(truck.get("quantity_left") or 0)
+    if not truck.get("material") or quantity_left < REFILL_BELOW_YARDS:
+        return TRUCK_CAPACITY_YARDS, True
+    return min(quantity_left, TRUCK_CAPACITY_YARDS), False
+
+
+def fit_jobs(candidates, load, max_jobs=MAX_JOBS):
+    """
+    Take candidates in order (best first) while they fit in `load` yards,
+    up to max_jobs. A truck carries one material, so once a job is picked
+    only jobs of the same material are considered.
+    """
+    picked = []
+    remaining = load
+    for job in candidates:
+        if len(picked) >= max_jobs or remaining <= 0:
+            break
+        if picked and job["material"] != picked[0]["material"]:
+            continue
+        bid_qty = float(job["bid_qty"] or 0)
+        if bid_qty <= remaining:
+            picked.append(job)
+            remaining -= bid_qty
+    return picked
+
+
+def schedule_truck(truck):
+    """
+    Schedule one truck from its loader entry (truck_id, material,
+    quantity_left and candidate jobs with distance_miles/night_access).
+
+    Returns (schedule, ambiguous). ambiguous is True when the rules alone
+    don't settle the choice: an empty truck could load any material, or
+    the last pick is a near tie with a job that was left out.
+    """
+    load, refill = starting_load(truck)
+    candidates = sorted(
+        (job for job in truck["jobs"] if job["distance_miles"] <= MAX_DISTANCE_MILES),
+        key=lambda job: (score_job(job), job["name"])
+    )
+
+    picked = fit_jobs(candidates, load)
+
+    # Nothing fits: take the best job and install what the truck carries
+    if not picked and candidates:
+        picked.append(candidates[0])
+
+    recommended_jobs = [
+        {
+            "job_name": job["name"],
+            "material": job["material"],
+            "bid_qty": job["bid_qty"],
+            "start_time": NIGHT_START if job["night_access"] else DAY_START,
+            "address": job["address"]
+        }
+        for job in picked
+    ]
+    schedule = {"truck": truck["truck_id"], "recommended_jobs": recommended_jobs}
+    if refill:
+        schedule["refill_yards"] = TRUCK_CAPACITY_YARDS
+
+    ambiguous = not truck.get("material")
+    if picked:
+        # A job left out that would also have fit and scores about the same as the last pick
+        last_score = score_job(picked[-1])
+        ties = [
+            job for job in candidates
+            if job not in picked
+            and job["material"] == picked[0]["material"]
+            and float(job["bid_qty"] or 0) <= load
+            and 0 <= score_job(job) - last_score < AMBIGUITY_MARGIN_MILES
+        ]
+        ambiguous = ambiguous or bool(ties)
+
+    return schedule, ambiguous
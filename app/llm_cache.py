@@ -0,0 +1,118 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+class LLMCache:
+    """
+    Disk-backed LLM response cache in SQLite, content-addressed by a hash of
+    (model, temperature, prompt).
+
+    Entries older than `ttl_seconds` are treated as misses and dropped. Once
+    the cache holds more than `max_entries`, the least recently used entries
+    are evicted. With `bypass=True` every lookup misses and nothing is stored.
+    """
+
+    def __init__(self, path, ttl_seconds=7 * 24 * 3600, max_entries=5000, bypass=False):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+
+    @staticmethod
+    def make_key(model, temperature, prompt):
+        raw = json.dumps([model, temperature, prompt], ensure_ascii=False)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, key):
+        """Return the cached response for key, or None on a miss."""
+        with self.lock:
+            if self.bypass:
+                self.misses += 1
+                return None
+
+            now = time.time()
+            row = self.conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            response, created_at = row
+            with self.conn:
+                if now - created_at > self.ttl_seconds:
+                    self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self.misses += 1
+                    return None
+                self.conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+
+            self.hits += 1
+            return json.loads(response)
+
+    def put(self, key, response):
+        """Store a parsed response and evict least recently used entries past max_entries."""
+        with self.lock:
+            if self.bypass:
+                return
+
+            now = time.time()
+            with self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, created_at, last_used) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(response), now, now)
+                )
+                self.stores += 1
+
+                (count,) = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+                overflow = count - self.max_entries
+                if overflow > 0:
+                    self.conn.execute("""
+                        DELETE FROM responses WHERE key IN (
+                            SELECT key FROM responses ORDER BY last_used ASC LIMIT ?
+                        )
+                    """, (overflow,))
+                    self.evictions += overflow
+
+    def stats(self):
+        with self.lock:
+            (size,) = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "size": size
+            }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
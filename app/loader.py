@@ -1,141 +1,238 @@
 # Assemble a full script piece-by-piece, starting with loading and parsing all 3 files
 import json
+import os
+import heapq
+import hashlib
 import pandas as pd
 from geopy.distance import distance
 from datetime import datetime
+from spatial_index import JobSpatialIndex
+from heuristic_scheduler import schedule_truck
+from fleet_assignment import assign_jobs
 
-# === Load data files ===
-with open("../database/json/truck_location.json", "r") as f:
-    truck_location_data = json.load(f)
+# === Matching config ===
+MAX_DISTANCE_MILES = 40
+# Haversine on a sphere can be off from the WGS-84 geodesic by ~0.5%, so keep
+# candidates slightly past the radius and let the geodesic refinement decide.
+HAVERSINE_SLACK = 1.01
+REFINE_GEODESIC = True
+MAX_JOBS_PER_TRUCK = 10
+ANY_MATERIAL = "*"  # partition key used by empty trucks
 
-with open("../database/json/truck.json", "r") as f:
-    truck_schedule_data = json.load(f)
+# === Incremental run config ===
+# Trucks whose fingerprint matches the one stored with their last schedule
+# are not re-prompted; simulator.py reuses that schedule entry instead.
+FINGERPRINT_PATH = "../database/json/truck_fingerprints.json"
+FINGERPRINT_COORD_DECIMALS = 3  # ~110 m, so GPS jitter of a parked truck doesn't count as a move
 
-with open("../database/json/api_out.json", "r") as f:
-    jobs_data_raw = json.load(f)
+# === Scheduler mode ===
+# "llm": prompt every changed truck (default)
+# "local": schedule every truck with heuristic_scheduler, no LLM calls
+# "hybrid": schedule locally and prompt only the trucks the heuristic flags as ambiguous
+SCHEDULER_MODE = os.getenv("SCHEDULER_MODE", "llm").lower()
+
+# === Fleet assignment ===
+# With FLEET_ASSIGNMENT set, jobs are shared out across the whole fleet first
+# (each job to at most one truck) and every truck only sees its own jobs.
+FLEET_ASSIGNMENT = os.getenv("FLEET_ASSIGNMENT", "").lower() in ("1", "true", "yes")
+ASSIGNMENT_CANDIDATES = 30  # nearest jobs per truck offered to the assignment
+
+# === Batched prompt config ===
+# With LLM_BATCH_MODE set, changed trucks are packed into shared prompts
+# (one instruction header, one section per truck) sized to the model's context.
+LLM_BATCH_MODE = os.getenv("LLM_BATCH_MODE", "").lower() in ("1", "true", "yes")
+LLM_CONTEXT_TOKENS = int(os.getenv("LLM_CONTEXT_TOKENS", 8192))  # llama3-8b-8192
+RESPONSE_TOKENS_PER_TRUCK = 400  # room for each truck's 2–3 job JSON answer
+CONTEXT_SAFETY_MARGIN = 0.8  # the ~4 chars/token estimate is rough
+
+# === Data files ===
+DATA_DIR = "../database/json"
+
+def load_data_files(data_dir=DATA_DIR):
+    with open(os.path.join(data_dir, "truck_location.json"), "r") as f:
+        truck_location_data = json.load(f)
+
+    with open(os.path.join(data_dir, "truck.json"), "r") as f:
+        truck_schedule_data = json.load(f)
+
+    with open(os.path.join(data_dir, "api_out.json"), "r") as f:
+        jobs_data_raw = json.load(f)
+
+    return truck_location_data, truck_schedule_data, jobs_data_raw
 
 # === STEP 1: Parse truck location info ===
-truck_locations = []
-for entry in truck_location_data:
-    if entry["StatusCode"] == 200:
-        vnum = entry["VehicleNumber"]
-        val = entry["ContentResource"]["Value"]
-        truck_locations.append({
-            "vehicle_number": vnum,
-            "latitude": val["Latitude"],
-            "longitude": val["Longitude"],
-            "address": val["Address"]["AddressLine1"],
-            "city": val["Address"]["Locality"],
-            "status": val["DisplayState"]
-        })
+def parse_truck_locations(truck_location_data):
+    truck_locations = []
+    for entry in truck_location_data:
+        if entry["StatusCode"] == 200:
+            vnum = entry["VehicleNumber"]
+            val = entry["ContentResource"]["Value"]
+            truck_locations.append({
+                "vehicle_number": vnum,
+                "latitude": val["Latitude"],
+                "longitude": val["Longitude"],
+                "address": val["Address"]["AddressLine1"],
+                "city": val["Address"]["Locality"],
+                "status": val["DisplayState"]
+            })
 
-df_truck_locations = pd.DataFrame(truck_locations)
+    return pd.DataFrame(truck_locations)
 
 # === STEP 2: Parse truck materials from truck.json Production Review ===
-truck_materials = {}
-for entry in truck_schedule_data:
-    if entry["group"] == "Production Review":
-        vehicle = entry["vehicle"]
-        jobs = entry["data"]
-        for job in reversed(jobs):  # use reversed to get the latest entry
-            qty_left = job.get("Quantity Left on Truck", "")
-            material = job.get("Material", "").strip()
-            if qty_left and qty_left not in ["0", "0.0", ""]:
-                truck_materials[vehicle] = {
-                    "material": material,
-                    "quantity_left": float(qty_left)
-                }
-                break
-
-# Merge truck material info
-df_truck_locations["material"] = df_truck_locations["vehicle_number"].map(
-    lambda v: truck_materials.get(v, {}).get("material", ""))
-df_truck_locations["quantity_left"] = df_truck_locations["vehicle_number"].map(
-    lambda v: truck_materials.get(v, {}).get("quantity_left", 0.0))
+def parse_truck_materials(truck_schedule_data):
+    truck_materials = {}
+    for entry in truck_schedule_data:
+        if entry["group"] == "Production Review":
+            vehicle = entry["vehicle"]
+            jobs = entry["data"]
+            for job in reversed(jobs):  # use reversed to get the latest entry
+                qty_left = job.get("Quantity Left on Truck", "")
+                material = job.get("Material", "").strip()
+                if qty_left and qty_left not in ["0", "0.0", ""]:
+                    truck_materials[vehicle] = {
+                        "material": material,
+                        "quantity_left": float(qty_left)
+                    }
+                    break
+    return truck_materials
+
+def merge_truck_materials(df_truck_locations, truck_materials):
+    df_truck_locations["material"] = df_truck_locations["vehicle_number"].map(
+        lambda v: truck_materials.get(v, {}).get("material", ""))
+    df_truck_locations["quantity_left"] = df_truck_locations["vehicle_number"].map(
+        lambda v: truck_materials.get(v, {}).get("quantity_left", 0.0))
+    return df_truck_locations
 
 # === STEP 3: Parse "Jobs to be Scheduled" from api_out.json ===
-jobs_to_be_scheduled = jobs_data_raw.get("Jobs to be Scheduled", [])
-parsed_jobs = []
-for job in jobs_to_be_scheduled:
-    parsed_jobs.append({
-        "name": job.get("Name", "").strip(),
-        "client": job.get("Client", "").strip(),
-        "status": job.get("Status", "").strip(),
-        "material": job.get("Material", "").strip(),
-        "bid_qty": float(job.get("Bid Qty", 0) or 0),
-        "address": job.get("Job Address", "").strip(),
-        "job_type": (job.get("Job Type") or "").strip(),
-        "latitude": job.get("Latitude", None),
-        "longitude": job.get("Longitude", None),
-        "night_access": str(job.get("Night?", "")).lower() == "yes"
-    })
-
-df_jobs_to_schedule = pd.DataFrame(parsed_jobs)
-df_jobs_to_schedule = df_jobs_to_schedule.dropna(subset=["latitude", "longitude"])
+def parse_jobs(jobs_data_raw):
+    jobs_to_be_scheduled = jobs_data_raw.get("Jobs to be Scheduled", [])
+    parsed_jobs = []
+    for job in jobs_to_be_scheduled:
+        parsed_jobs.append({
+            "name": job.get("Name", "").strip(),
+            "client": job.get("Client", "").strip(),
+            "status": job.get("Status", "").strip(),
+            "material": job.get("Material", "").strip(),
+            "bid_qty": float(job.get("Bid Qty", 0) or 0),
+            "address": (job.get("Job Address") or job.get("Address") or "").strip(),
+            "job_type": (job.get("Job Type") or "").strip(),
+            "latitude": job.get("Latitude", None),
+            "longitude": job.get("Longitude", None),
+            # Main_Data writes "✅ Yes" / "❌ No"
+            "night_access": str(job.get("Night?", "")).lower().endswith("yes")
+        })
+
+    df_jobs_to_schedule = pd.DataFrame(parsed_jobs)
+    return df_jobs_to_schedule.dropna(subset=["latitude", "longitude"]).reset_index(drop=True)
 
 # === STEP 4: Match jobs for each truck based on material and 40-mile radius ===
-def find_jobs_for_truck(truck_row):
+def build_job_indexes(jobs_df):
+    """
+    Partition the jobs by material with one spatial index each, plus an
+    ANY_MATERIAL index over every job for empty trucks. Indexes return row
+    positions in jobs_df, so they all resolve against its records.
+    """
+    indexes = {ANY_MATERIAL: JobSpatialIndex(jobs_df["latitude"], jobs_df["longitude"])}
+    for material, group in jobs_df.groupby("material", sort=False):
+        indexes[material] = JobSpatialIndex(
+            group["latitude"], group["longitude"], ids=group.index.to_numpy())
+    return indexes
+
+def find_jobs_for_truck(truck_row, job_indexes, job_records, limit=None):
+    """
+    Jobs within MAX_DISTANCE_MILES of the truck that carry its material.
+    With a limit, only jobs that can still rank among the `limit` closest
+    are refined and returned.
+    """
     truck_coords = (truck_row["latitude"], truck_row["longitude"])
     material = truck_row["material"]
-    is_empty = not material
     nearby = []
 
-    for _, job in df_jobs_to_schedule.iterrows():
-        job_coords = (job["latitude"], job["longitude"])
-        job_distance = distance(truck_coords, job_coords).miles
+    # Only jobs carrying the truck's material are ever distance-checked
+    job_index = job_indexes.get(material or ANY_MATERIAL)
+    if job_index is None:
+        return nearby
+
+    radius = MAX_DISTANCE_MILES * HAVERSINE_SLACK if REFINE_GEODESIC else MAX_DISTANCE_MILES
+    job_ids, job_dists = job_index.within_radius(truck_row["latitude"], truck_row["longitude"], radius)
+
+    if limit is not None and len(job_ids) > limit:
+        # Results are sorted by haversine distance. A job further than the
+        # limit-th one (plus the haversine/geodesic error both ways) can't
+        # make the top `limit`, so skip the per-job geodesic for it.
+        cutoff = job_dists[limit - 1] * HAVERSINE_SLACK ** 2 if REFINE_GEODESIC else job_dists[limit - 1]
+        keep = job_dists <= cutoff
+        job_ids, job_dists = job_ids[keep], job_dists[keep]
 
-        if job_distance <= 40:
-            if is_empty or job["material"] == material:
-                job_entry = job.to_dict()
-                job_entry["distance_miles"] = round(job_distance, 2)
-                nearby.append(job_entry)
+    for job_idx, haversine_miles in zip(job_ids, job_dists):
+        job = job_records[job_idx]
+
+        if REFINE_GEODESIC:
+            # Exact geodesic only for the few candidates the index returned
+            job_distance = distance(truck_coords, (job["latitude"], job["longitude"])).miles
+        else:
+            job_distance = float(haversine_miles)
+
+        if job_distance <= MAX_DISTANCE_MILES:
+            job_entry = dict(job)
+            job_entry["job_id"] = int(job_idx)
+            job_entry["distance_miles"] = round(job_distance, 2)
+            nearby.append(job_entry)
 
     return nearby
 
-# === STEP 5: Generate LLM prompts ===
-llm_prompts = []
-llm_input_data = []
-
-for _, truck_row in df_truck_locations.iterrows():
-    truck_id = truck_row["vehicle_number"]
-    nearby_jobs = find_jobs_for_truck(truck_row)
-    
-    if not nearby_jobs:
-        continue
-
-    truck_data = {
-        "truck_id": truck_id,
-        "location": {
-            "latitude": truck_row["latitude"],
-            "longitude": truck_row["longitude"],
-            "city": truck_row["city"],
-            "address": truck_row["address"]
-        },
+def truck_fingerprint(truck_row, jobs):
+    """Hash of everything that feeds a truck's prompt, with position rounded to a tolerance."""
+    job_set = sorted(
+        [job["name"], job["material"], float(job["bid_qty"]), bool(job["night_access"]), job["address"]]
+        for job in jobs
+    )
+    state = {
+        "latitude": round(float(truck_row["latitude"]), FINGERPRINT_COORD_DECIMALS),
+        "longitude": round(float(truck_row["longitude"]), FINGERPRINT_COORD_DECIMALS),
         "material": truck_row["material"],
-        "quantity_left": truck_row["quantity_left"],
-        "jobs": sorted(nearby_jobs, key=lambda j: j["distance_miles"])[:10]
+        "quantity_left": float(truck_row["quantity_left"]),
+        "jobs": hashlib.sha256(json.dumps(job_set).encode()).hexdigest()
     }
-    llm_input_data.append(truck_data)
+    return hashlib.sha256(json.dumps(state, sort_keys=True).encode()).hexdigest()
+
+def load_previous_fingerprints(path):
+    try:
+        with open(path, "r") as f:
+            cache = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    return {truck_id: entry.get("fingerprint") for truck_id, entry in cache.items()}
 
+# === STEP 5: Generate LLM prompts ===
+def estimate_tokens(text):
+    return len(text) // 4
+
+def render_truck_section(truck_id, truck_row, jobs):
     job_descriptions = []
-    for idx, job in enumerate(truck_data["jobs"], start=1):
+    for idx, job in enumerate(jobs, start=1):
         job_descriptions.append(
             f"{idx}. {job['name']} — Material: {job['material']}, "
             f"Bid Qty: {job['bid_qty']} yards, Distance: {job['distance_miles']} miles, "
             f"Night Access: {'Yes' if job['night_access'] else 'No'}"
         )
 
-    prompt = f"""
-You are a scheduling assistant for mulch delivery trucks.
-
+    return f"""
 Truck ID: {truck_id}
 Location: {truck_row['address']} ({truck_row['latitude']}, {truck_row['longitude']})
 Material on board: {truck_row['material'] or 'None (empty)'}
 Quantity left on truck: {truck_row['quantity_left']} yards
 Truck max capacity: 40 yards
 
-Here are 10 nearby jobs to choose from:
+Here are {len(jobs)} nearby jobs to choose from:
 {chr(10).join(job_descriptions)}
+""".strip()
+
+def render_prompt(truck_id, section):
+    return f"""
+You are a scheduling assistant for mulch delivery trucks.
+
+{section}
 
 Instructions:
 1. Select 2–3 jobs from the list for this truck to perform tomorrow.
@@ -158,13 +255,171 @@ Instructions:
 }}
 """.strip()
 
-    llm_prompts.append({
-        "truck_id": truck_id,
-        "prompt": prompt
-    })
+BATCH_HEADER = """
+You are a scheduling assistant for mulch delivery trucks.
+
+Each truck below has its own location, load and list of nearby jobs.
+
+Instructions (apply to every truck separately):
+1. Select 2–3 jobs from that truck's own list for it to perform tomorrow.
+2. If a truck is empty or has less than 10 yards left, ask to fill up with 40 yards of mulch.
+3. Prefer jobs with night access first (can start at 5 AM), otherwise default start is 7 AM.
+4. Only pick jobs within 40 miles.
+5. Return ONE JSON array with exactly one object per truck, like this:
+
+[
+  {
+    "truck": "Truck ID",
+    "recommended_jobs": [
+      {
+        "job_name": "Job Name",
+        "material": "Material",
+        "bid_qty": 20,
+        "start_time": "5:00 AM",
+        "address": "Full address"
+      }
+    ]
+  }
+]
+""".strip()
+
+def render_batch_prompt(sections):
+    return BATCH_HEADER + "\n\n" + "\n\n".join(f"=== Truck {truck_id} ===\n{section}" for truck_id, section in sections)
+
+def pack_batches(sections):
+    """
+    Greedily pack (truck_id, section) pairs into batches whose prompt plus
+    expected answers fit within the model's context window.
+    """
+    budget = LLM_CONTEXT_TOKENS * CONTEXT_SAFETY_MARGIN - estimate_tokens(BATCH_HEADER)
+    batches, current, used = [], [], 0
+
+    for truck_id, section in sections:
+        cost = estimate_tokens(section) + RESPONSE_TOKENS_PER_TRUCK
+        if current and used + cost > budget:
+            batches.append(current)
+            current, used = [], 0
+        current.append((truck_id, section))
+        used += cost
+
+    if current:
+        batches.append(current)
+    return batches
+
+def match_trucks_to_jobs(df_truck_locations, df_jobs_to_schedule):
+    """Candidate jobs per truck as (truck_row, truck_data) pairs, in truck order."""
+    job_indexes = build_job_indexes(df_jobs_to_schedule)
+    job_records = df_jobs_to_schedule.to_dict("records")
+    candidate_count = ASSIGNMENT_CANDIDATES if FLEET_ASSIGNMENT else MAX_JOBS_PER_TRUCK
+    trucks_to_schedule = []
+
+    for _, truck_row in df_truck_locations.iterrows():
+        truck_id = truck_row["vehicle_number"]
+        nearby_jobs = find_jobs_for_truck(truck_row, job_indexes, job_records, limit=candidate_count)
+        
+        if not nearby_jobs:
+            continue
+
+        truck_data = {
+            "truck_id": truck_id,
+            "location": {
+                "latitude": truck_row["latitude"],
+                "longitude": truck_row["longitude"],
+                "city": truck_row["city"],
+                "address": truck_row["address"]
+            },
+            "material": truck_row["material"],
+            "quantity_left": truck_row["quantity_left"],
+            # Bounded heap instead of sorting every nearby job
+            "jobs": heapq.nsmallest(candidate_count, nearby_jobs, key=lambda j: j["distance_miles"])
+        }
+        trucks_to_schedule.append((truck_row, truck_data))
+
+    if FLEET_ASSIGNMENT:
+        # Constrain every truck to the jobs the fleet-wide assignment gave it
+        assignments = assign_jobs([truck_data for _, truck_data in trucks_to_schedule])
+        for _, truck_data in trucks_to_schedule:
+            assigned = assignments[truck_data["truck_id"]]
+            truck_data["jobs"] = sorted(assigned, key=lambda j: j["distance_miles"])
+        trucks_to_schedule = [(row, data) for row, data in trucks_to_schedule if data["jobs"]]
+
+    return trucks_to_schedule
+
+def build_llm_prompts(trucks_to_schedule, previous_fingerprints):
+    """
+    One llm_prompts.json entry per truck (prompt, local schedule, or reuse
+    marker), followed by any batch entries.
+    """
+    llm_prompts = []
+    pending_sections = []
+
+    for truck_row, truck_data in trucks_to_schedule:
+        truck_id = truck_data["truck_id"]
+
+        fingerprint = truck_fingerprint(truck_row, truck_data["jobs"])
+        if previous_fingerprints.get(truck_id) == fingerprint:
+            # Nothing changed for this truck: no new prompt, reuse the last schedule
+            llm_prompts.append({
+                "truck_id": truck_id,
+                "fingerprint": fingerprint,
+                "prompt": None
+            })
+            continue
+
+        if SCHEDULER_MODE in ("local", "hybrid"):
+            local_schedule, ambiguous = schedule_truck(truck_data)
+            if SCHEDULER_MODE == "local" or not ambiguous:
+                # Decided by the rules alone; simulator.py uses it as-is
+                llm_prompts.append({
+                    "truck_id": truck_id,
+                    "fingerprint": fingerprint,
+                    "prompt": None,
+                    "schedule": local_schedule
+                })
+                continue
+
+        section = render_truck_section(truck_id, truck_row, truck_data["jobs"])
+
+        if LLM_BATCH_MODE:
+            # Keeps the truck's place in the run; its prompt goes in a batch entry below
+            llm_prompts.append({
+                "truck_id": truck_id,
+                "fingerprint": fingerprint,
+                "prompt": None,
+                "batched": True
+            })
+            pending_sections.append((truck_id, section))
+            continue
+
+        llm_prompts.append({
+            "truck_id": truck_id,
+            "fingerprint": fingerprint,
+            "prompt": render_prompt(truck_id, section)
+        })
+
+    # Batch entries list every truck they cover; simulator.py splits the answer back per truck
+    for batch in pack_batches(pending_sections):
+        llm_prompts.append({
+            "truck_ids": [truck_id for truck_id, _ in batch],
+            "prompt": render_batch_prompt(batch)
+        })
+
+    return llm_prompts
+
+def run():
+    """Build the prompts from the synced JSON files and save llm_prompts.json. Returns the prompts."""
+    truck_location_data, truck_schedule_data, jobs_data_raw = load_data_files()
+
+    df_truck_locations = parse_truck_locations(truck_location_data)
+    df_truck_locations = merge_truck_materials(df_truck_locations, parse_truck_materials(truck_schedule_data))
+    df_jobs_to_schedule = parse_jobs(jobs_data_raw)
+
+    trucks_to_schedule = match_trucks_to_jobs(df_truck_locations, df_jobs_to_schedule)
+    llm_prompts = build_llm_prompts(trucks_to_schedule, load_previous_fingerprints(FINGERPRINT_PATH))
 
-# Display one sample prompt (you'll wire this into Groq next)
-llm_prompts[0]
+    with open(os.path.join(DATA_DIR, "llm_prompts.json"), "w") as f:
+        json.dump(llm_prompts, f)
+    return llm_prompts
 
-with open("../database/json/llm_prompts.json", "w") as f:
-    json.dump(llm_prompts, f)
\ No newline at end of file
+if __name__ == "__main__":
+    run()
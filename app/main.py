@@ -1,35 +1,58 @@
-import subprocess
+import contextlib
 import datetime
+import os
+import sys
+
+# The pipeline runner lives with the sync scripts in database/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "database"))
+import pipeline
+
+import loader
+import simulator
+
+
+class Tee:
+    """Write stage output to the console and the run log at once."""
+    def __init__(self, *streams):
+        self.streams = streams
+
+    def write(self, text):
+        for stream in self.streams:
+            stream.write(text)
+
+    def flush(self):
+        for stream in self.streams:
+            stream.flush()
+
+
+def schedule(loader):
+    # loader's prompts come in memory (None if it failed, in which case
+    # the simulator reads the last llm_prompts.json)
+    simulator.run(loader)
+
+
+def build_stages():
+    return [
+        pipeline.Stage("loader", loader.run),
+        pipeline.Stage("simulator", schedule, deps=["loader"]),
+    ]
 
-def run_script(script_name, log_file):
-    try:
-        log_file.write(f"\n🚀 Running {script_name}...\n")
-        result = subprocess.run(["python3", script_name], capture_output=True, text=True)
-        log_file.write(result.stdout)
-        log_file.write(result.stderr)
-
-        if result.returncode == 0:
-            log_file.write(f"✅ {script_name} completed successfully.\n")
-            print(f"✅ {script_name} completed successfully.")
-        else:
-            log_file.write(f"⚠️ {script_name} finished with errors.\n")
-            print(f"⚠️ {script_name} finished with errors.")
-
-    except Exception as e:
-        error_msg = f"❌ Failed to run {script_name}: {e}\n"
-        log_file.write(error_msg)
-        print(error_msg)
 
 if __name__ == "__main__":
     timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     with open("schedule_run.log", "a") as log_file:
         log_file.write(f"\n\n==== Schedule Run @ {timestamp} ====\n")
-        
-        run_script("loader.py", log_file)
-        run_script("simulator.py", log_file)
 
-        log_file.write("🎯 All steps finished. Check 'truck_schedule_output.txt' for the schedule.\n")
+        with contextlib.redirect_stdout(Tee(sys.stdout, log_file)):
+            reports = pipeline.run_pipeline(build_stages())
+            pipeline.print_summary(reports)
 
-    print("\n🎯 All steps finished. Check 'truck_schedule_output.txt' and 'schedule_run.log'.")
+        for name, report in reports.items():
+            if report["status"] == "ok":
+                log_file.write(f"✅ {name} completed successfully.\n")
+            else:
+                log_file.write(f"⚠️ {name} finished with errors: {report['error']}\n")
 
+        log_file.write("🎯 All steps finished. Check 'truck_schedule_output.txt' for the schedule.\n")
 
+    print("\n🎯 All steps finished. Check 'truck_schedule_output.txt' and 'schedule_run.log'.")
@@ -1,21 +1,70 @@
-import requests
 import json
 from dotenv import load_dotenv
 import os
-import time
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from rate_limit import RateLimiter
+from llm_cache import LLMCache
+
+# Shared pooled HTTP session lives with the other API callers in database/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "database"))
+from http_client import get_session
 load_dotenv()
 
 # Groq API Configuration
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GROQ_MODEL = "llama3-8b-8192"
 GROQ_ENDPOINT = "https://api.groq.com/openai/v1/chat/completions"
+GROQ_TEMPERATURE = 0.3
+
+# Dispatcher limits (defaults match Groq's free tier for this model)
+GROQ_MAX_CONCURRENCY = int(os.getenv("GROQ_MAX_CONCURRENCY", 4))
+GROQ_REQUESTS_PER_MINUTE = int(os.getenv("GROQ_REQUESTS_PER_MINUTE", 30))
+GROQ_TOKENS_PER_MINUTE = int(os.getenv("GROQ_TOKENS_PER_MINUTE", 30000))
+RESPONSE_TOKEN_ESTIMATE = 400  # room for a 2–3 job JSON answer
+
+# Persistent response cache (set LLM_CACHE_BYPASS=1 to always hit the API)
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3")
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 5000))
+LLM_CACHE_BYPASS = os.getenv("LLM_CACHE_BYPASS", "").lower() in ("1", "true", "yes")
+
+def open_llm_cache():
+    """Open the response cache; run() opens one per call and closes it when done."""
+    return LLMCache(
+        LLM_CACHE_PATH,
+        ttl_seconds=LLM_CACHE_TTL_SECONDS,
+        max_entries=LLM_CACHE_MAX_ENTRIES,
+        bypass=LLM_CACHE_BYPASS
+    )
+
+# Last schedule per truck, keyed by the fingerprint loader.py computed for it
+FINGERPRINT_PATH = "../database/json/truck_fingerprints.json"
 
 import re
 
-def extract_json_block(text):
+def extract_json_block(text, truck_ids=None):
     """
     Extracts the first JSON object from a block of text.
+
+    For a batched answer pass the batch's truck_ids: the JSON array is parsed
+    and split into {truck_id: schedule} for the trucks that were asked about.
     """
+    if truck_ids is not None:
+        match = re.search(r"\[\s*{.*}\s*\]", text, re.DOTALL)
+        if match:
+            try:
+                entries = json.loads(match.group(0))
+            except json.JSONDecodeError:
+                print("❌ JSON array found but could not be decoded.")
+                return None
+            split = {
+                entry["truck"]: entry for entry in entries
+                if isinstance(entry, dict) and entry.get("truck") in truck_ids
+            }
+            return split or None
+        return None
+
     match = re.search(r"{\s*\"truck\".*}", text, re.DOTALL)
     if match:
         try:
@@ -24,7 +73,21 @@ def extract_json_block(text):
             print("❌ JSON structure found but could not be decoded.")
     return None
 
-def call_groq_llm(prompt: str, truck_id: str):
+def request_completion(prompt: str, label: str, parse, llm_cache, limiter=None, trucks=1):
+    """
+    Send one prompt to Groq (or answer it from the cache) and return parse(raw_text),
+    or None if the call failed or the answer could not be parsed.
+    """
+    cache_key = LLMCache.make_key(GROQ_MODEL, GROQ_TEMPERATURE, prompt)
+    cached = llm_cache.get(cache_key)
+    if cached is not None:
+        print(f"💾 Cache hit for {label}")
+        return cached
+
+    if limiter is not None:
+        limiter.acquire(estimate_tokens(prompt, trucks))
+    print(f"📡 Sending prompt for {label}...")
+
     headers = {
         "Authorization": f"Bearer {GROQ_API_KEY}",
         "Content-Type": "application/json"
@@ -32,30 +95,70 @@ def call_groq_llm(prompt: str, truck_id: str):
     payload = {
         "model": GROQ_MODEL,
         "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0.3
+        "temperature": GROQ_TEMPERATURE
     }
 
     try:
-        response = requests.post(GROQ_ENDPOINT, headers=headers, json=payload)
+        response = get_session().post(GROQ_ENDPOINT, headers=headers, json=payload)
         if response.status_code != 200:
-            print(f"❌ Groq API error for {truck_id}: {response.status_code} - {response.text}")
-            return {"truck": truck_id, "recommended_jobs": []}
+            print(f"❌ Groq API error for {label}: {response.status_code} - {response.text}")
+            return None
 
         # Extract and clean JSON from text
         raw_text = response.json()["choices"][0]["message"]["content"]
-        parsed = extract_json_block(raw_text)
+        parsed = parse(raw_text)
 
         if parsed:
+            llm_cache.put(cache_key, parsed)
             return parsed
         else:
-            print(f"❌ Could not parse JSON from Groq for truck {truck_id}")
-            return {"truck": truck_id, "recommended_jobs": []}
+            print(f"❌ Could not parse JSON from Groq for {label}")
+            return None
 
     except Exception as e:
-        print(f"❌ Exception for truck {truck_id}: {e}")
-        return {"truck": truck_id, "recommended_jobs": []}
+        print(f"❌ Exception for {label}: {e}")
+        return None
+
+def call_groq_llm(prompt: str, truck_id: str, llm_cache, limiter=None):
+    parsed = request_completion(prompt, f"Truck {truck_id}", extract_json_block, llm_cache, limiter)
+    return parsed or {"truck": truck_id, "recommended_jobs": []}
+
+def call_groq_llm_batch(prompt: str, truck_ids, llm_cache, limiter=None):
+    """Send a multi-truck prompt and return one schedule per truck, in truck_ids order."""
+    parsed = request_completion(
+        prompt, f"Trucks {', '.join(truck_ids)}",
+        lambda text: extract_json_block(text, truck_ids),
+        llm_cache, limiter, trucks=len(truck_ids)
+    ) or {}
+
+    results = []
+    for truck_id in truck_ids:
+        if truck_id not in parsed:
+            print(f"❌ No schedule for truck {truck_id} in batched answer")
+        results.append(parsed.get(truck_id) or {"truck": truck_id, "recommended_jobs": []})
+    return results
 
+def estimate_tokens(prompt: str, trucks=1):
+    """Rough token count (~4 characters per token) plus the expected answers."""
+    return len(prompt) // 4 + RESPONSE_TOKEN_ESTIMATE * trucks
 
+def dispatch_prompts(entries, llm_cache, max_concurrency=GROQ_MAX_CONCURRENCY, limiter=None):
+    """
+    Send prompts to Groq on a bounded thread pool behind a requests/min and
+    tokens/min limiter. Responses are returned in the same order as entries;
+    a batch entry (with "truck_ids") yields a list of per-truck responses.
+    """
+    if limiter is None:
+        limiter = RateLimiter(GROQ_REQUESTS_PER_MINUTE, GROQ_TOKENS_PER_MINUTE)
+
+    def send(entry):
+        # Cache hits return before touching the limiter
+        if "truck_ids" in entry:
+            return call_groq_llm_batch(entry["prompt"], entry["truck_ids"], llm_cache, limiter=limiter)
+        return call_groq_llm(entry["prompt"], entry["truck_id"], llm_cache, limiter=limiter)
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        return list(pool.map(send, entries))
 
 # Format and print schedule
 def format_schedule(schedule_data):
@@ -66,6 +169,8 @@ def format_schedule(schedule_data):
     for truck in schedule_data:
         lines.append(f"Truck: {truck['truck']}")
         lines.append("Jobs for Tomorrow:")
+        if truck.get("refill_yards"):
+            lines.append(f"Fill up with {truck['refill_yards']} yards before the first job.")
         lines.append("Job No. | Job’s Name                 | Material     | Address")
         for i, job in enumerate(truck["recommended_jobs"], start=1):
             lines.append(f"{i:<8} | {job['job_name']:<25} | {job['material']:<12} | {job['address']}")
@@ -73,29 +178,79 @@ def format_schedule(schedule_data):
 
     return "\n".join(lines)
 
-# Load prompts
-with open("../database/json/llm_prompts.json", "r") as f:
-    llm_prompts = json.load(f)
+def load_schedule_cache(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+PROMPTS_PATH = "../database/json/llm_prompts.json"
+
+def run(llm_prompts=None):
+    """Schedule every truck from loader.py's prompts (read from llm_prompts.json when not given)."""
+    if llm_prompts is None:
+        with open(PROMPTS_PATH, "r") as f:
+            llm_prompts = json.load(f)
+
+    schedule_cache = load_schedule_cache(FINGERPRINT_PATH)
+    updated_cache = {}
+
+    # Call Groq API concurrently for each truck whose inputs changed since its last schedule
+    to_dispatch = [entry for entry in llm_prompts if entry["prompt"] is not None]
+    responses = {}
+    with open_llm_cache() as llm_cache:
+        for entry, response in zip(to_dispatch, dispatch_prompts(to_dispatch, llm_cache)):
+            if "truck_ids" in entry:
+                responses.update(zip(entry["truck_ids"], response))
+            else:
+                responses[entry["truck_id"]] = response
+        print(f"💾 LLM cache: {llm_cache.stats()}")
+
+    # Trucks the local scheduler already decided in loader.py
+    for entry in llm_prompts:
+        if entry.get("schedule"):
+            responses[entry["truck_id"]] = entry["schedule"]
+
+    # Schedule container, kept in truck order
+    final_schedule = []
+
+    for entry in llm_prompts:
+        if "truck_ids" in entry:
+            continue  # batch prompt; its trucks have their own entries
+
+        truck_id = entry["truck_id"]
+        fingerprint = entry.get("fingerprint")
+        cached = schedule_cache.get(truck_id)
+
+        if truck_id not in responses:
+            if cached and cached.get("fingerprint") == fingerprint:
+                print(f"♻️ Truck {truck_id} unchanged, reusing previous schedule.")
+                final_schedule.append(cached["schedule"])
+                updated_cache[truck_id] = cached
+            else:
+                print(f"⚠️ No prompt or cached schedule for Truck {truck_id}, skipping.")
+            continue
 
-# Schedule container
-final_schedule = []
+        response = responses[truck_id]
+        print(response)
+        if response and "recommended_jobs" in response:
+            final_schedule.append(response)
+            # Only remember real answers so failed calls are retried next run
+            if fingerprint and response["recommended_jobs"]:
+                updated_cache[truck_id] = {"fingerprint": fingerprint, "schedule": response}
 
-# Call Groq API for each truck
-for entry in llm_prompts:
-    truck_id = entry["truck_id"]
-    prompt = entry["prompt"]
+    with open(FINGERPRINT_PATH, "w") as f:
+        json.dump(updated_cache, f, indent=2)
 
-    print(f"📡 Sending prompt for Truck {truck_id}...")
-    response = call_groq_llm(prompt, truck_id)
-    print(response)
-    if response and "recommended_jobs" in response:
-        final_schedule.append(response)
-    time.sleep(2)
+    # Format and save the output
+    schedule = format_schedule(final_schedule)
 
-# Format and save the output
-schedule = format_schedule(final_schedule)
+    with open("truck_schedule_output.txt", "w") as f:
+        f.write(schedule)
 
-with open("truck_schedule_output.txt", "w") as f:
-    f.write(schedule)
+    print("✅ Done. Schedule written to 'truck_schedule_output.txt'")
+    return final_schedule
 
-print("✅ Done. Schedule written to 'truck_schedule_output.txt'")
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,108 @@
+import math
+from collections import defaultdict
+
+import numpy as np
+
+EARTH_RADIUS_MILES = 3958.7613
+MILES_PER_DEGREE_LAT = 69.0
+DEFAULT_CELL_DEGREES = 0.25  # ~17 miles of latitude per cell
+
+
+def haversine_matrix(lat1, lon1, lat2, lon2):
+    """Great-circle distance in miles from every (lat1, lon1) to every (lat2, lon2)."""
+    lat1 = np.radians(np.asarray(lat1, dtype=float))[:, None]
+    lon1 = np.radians(np.asarray(lon1, dtype=float))[:, None]
+    lat2 = np.radians(np.asarray(lat2, dtype=float))[None, :]
+    lon2 = np.radians(np.asarray(lon2, dtype=float))[None, :]
+
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class JobSpatialIndex:
+    """
+    Grid bucket index over job coordinates.
+
+    Points are bucketed into fixed lat/lon cells, so a radius query only
+    computes distances for the jobs in the cells that overlap the search
+    box instead of the whole board. Results are the `ids` the index was
+    built with (positional indices into the coordinate arrays by default),
+    so an index over a subset of jobs can still answer in board positions.
+    """
+
+    def __init__(self, latitudes, longitudes, ids=None, cell_degrees=DEFAULT_CELL_DEGREES):
+        self.latitudes = np.asarray(latitudes, dtype=float)
+        self.longitudes = np.asarray(longitudes, dtype=float)
+        self.ids = np.arange(len(self.latitudes)) if ids is None else np.asarray(ids)
+        self.cell_degrees = cell_degrees
+
+        buckets = defaultdict(list)
+        for idx, (lat, lon) in enumerate(zip(self.latitudes, self.longitudes)):
+            buckets[self._cell(lat, lon)].append(idx)
+        self.buckets = {cell: np.array(members, dtype=int) for cell, members in buckets.items()}
+
+    def __len__(self):
+        return len(self.latitudes)
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.cell_degrees), math.floor(lon / self.cell_degrees))
+
+    def _candidates(self, lat, lon, miles):
+        """Indices of every job in the cells overlapping the search box."""
+        lat_span = miles / MILES_PER_DEGREE_LAT
+        # Guard against the poles where a degree of longitude collapses to 0 miles
+        cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+        lon_span = min(miles / (MILES_PER_DEGREE_LAT * cos_lat), 180.0)
+
+        row_min, col_min = self._cell(lat - lat_span, lon - lon_span)
+        row_max, col_max = self._cell(lat + lat_span, lon + lon_span)
+
+        found = []
+        for row in range(row_min, row_max + 1):
+            for col in range(col_min, col_max + 1):
+                members = self.buckets.get((row, col))
+                if members is not None:
+                    found.append(members)
+
+        if not found:
+            return np.empty(0, dtype=int)
+        return np.concatenate(found)
+
+    def _distances(self, lat, lon, positions):
+        return haversine_matrix([lat], [lon], self.latitudes[positions], self.longitudes[positions])[0]
+
+    def within_radius(self, lat, lon, miles):
+        """
+        Return (indices, distances) of all jobs within `miles` of (lat, lon),
+        sorted by distance.
+        """
+        positions = self._candidates(lat, lon, miles)
+        if len(positions) == 0:
+            return self.ids[positions], np.empty(0)
+
+        dists = self._distances(lat, lon, positions)
+        keep = dists <= miles
+        positions, dists = positions[keep], dists[keep]
+
+        order = np.argsort(dists, kind="stable")
+        return self.ids[positions[order]], dists[order]
+
+    def k_nearest(self, lat, lon, k):
+        """
+        Return (indices, distances) of the `k` jobs closest to (lat, lon).
+        The search radius doubles from one cell until k jobs are covered.
+        """
+        k = min(k, len(self))
+        if k <= 0:
+            return self.ids[:0], np.empty(0)
+
+        miles = self.cell_degrees * MILES_PER_DEGREE_LAT
+        while True:
+            ids, dists = self.within_radius(lat, lon, miles)
+            if len(ids) >= k:
+                return ids[:k], dists[:k]
+            # Past half the circumference every job is already in range
+            if miles >= math.pi * EARTH_RADIUS_MILES:
+                return ids, dists
+            miles *= 2
@@ -0,0 +1,172 @@
+"""
+Time each scheduling stage on synthetic snapshots at several fleet/board
+sizes and write the results as JSON so runs can be compared.
+
+Stages:
+  parse            json.load of the three snapshots + truck location / job parsing
+  truck_materials  material and quantity extraction from truck.json Production Review
+  matching         spatial index build + per-truck candidate selection
+  prompt_rendering llm_prompts.json entries for every truck
+  sync_ingestion   streaming api_out.json / truck.json into jobs and assignment records (no database writes)
+
+Usage:
+    python benchmark_pipeline.py --sizes 10x100 100x5000 1000x50000 --repeat 3
+    python benchmark_pipeline.py --baseline results/previous.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from tabulate import tabulate
+
+from generate_synthetic_data import generate
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "app"))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "database"))
+
+import loader  # noqa: E402
+import records  # noqa: E402
+
+DEFAULT_SIZES = ["10x100", "100x1000", "100x5000", "1000x50000"]
+REGRESSION_THRESHOLD = 1.2  # flag stages 20% slower than the baseline
+
+
+def time_call(fn, repeat):
+    """Run fn `repeat` times; return (last result, list of durations in seconds)."""
+    durations = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        durations.append(time.perf_counter() - start)
+    return result, durations
+
+
+def run_stages(data_dir, repeat):
+    timings = {}
+
+    def parse():
+        truck_location_data, truck_schedule_data, jobs_data_raw = loader.load_data_files(data_dir)
+        return (
+            loader.parse_truck_locations(truck_location_data),
+            truck_schedule_data,
+            loader.parse_jobs(jobs_data_raw)
+        )
+
+    (df_trucks, truck_schedule_data, df_jobs), timings["parse"] = time_call(parse, repeat)
+
+    def truck_materials():
+        materials = loader.parse_truck_materials(truck_schedule_data)
+        return loader.merge_truck_materials(df_trucks.copy(), materials)
+
+    df_trucks, timings["truck_materials"] = time_call(truck_materials, repeat)
+
+    trucks_to_schedule, timings["matching"] = time_call(
+        lambda: loader.match_trucks_to_jobs(df_trucks, df_jobs), repeat)
+
+    _, timings["prompt_rendering"] = time_call(
+        lambda: loader.build_llm_prompts(trucks_to_schedule, {}), repeat)
+
+    def sync_ingestion():
+        jobs = sum(1 for _ in records.iter_jobs(os.path.join(data_dir, "api_out.json")))
+        assignments = sum(1 for _ in records.iter_assignments(os.path.join(data_dir, "truck.json")))
+        return jobs, assignments
+
+    _, timings["sync_ingestion"] = time_call(sync_ingestion, repeat)
+
+    return timings, len(trucks_to_schedule)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+            capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, "r") as f:
+        baseline = json.load(f)
+    previous = {(r["trucks"], r["jobs"], r["stage"]): r["min_s"] for r in baseline["results"]}
+
+    regressions = []
+    for r in results:
+        before = previous.get((r["trucks"], r["jobs"], r["stage"]))
+        if before:
+            r["baseline_min_s"] = before
+            r["ratio"] = round(r["min_s"] / before, 3)
+            if r["ratio"] > REGRESSION_THRESHOLD:
+                regressions.append(r)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scheduling pipeline on synthetic data.")
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES,
+                        help="TRUCKSxJOBS pairs, e.g. 100x5000")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None,
+                        help="results file (default results/bench_<timestamp>.json)")
+    parser.add_argument("--baseline", default=None, help="previous results file to compare against")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        num_trucks, num_jobs = (int(n) for n in size.lower().split("x"))
+        print(f"\n⏱️ {num_trucks} trucks / {num_jobs} jobs")
+
+        with tempfile.TemporaryDirectory() as data_dir:
+            generate(data_dir, num_trucks, num_jobs, args.seed)
+            timings, matched_trucks = run_stages(data_dir, args.repeat)
+
+        for stage, durations in timings.items():
+            results.append({
+                "trucks": num_trucks,
+                "jobs": num_jobs,
+                "matched_trucks": matched_trucks,
+                "stage": stage,
+                "min_s": round(min(durations), 6),
+                "median_s": round(statistics.median(durations), 6),
+                "runs": len(durations)
+            })
+
+    regressions = compare(results, args.baseline) if args.baseline else []
+
+    print()
+    print(tabulate(results, headers="keys", tablefmt="grid"))
+
+    output = args.output or os.path.join(
+        BENCH_DIR, "results", f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "repeat": args.repeat,
+            "seed": args.seed,
+            "results": results
+        }, f, indent=2)
+    print(f"\n✅ Results saved to {output}")
+
+    if regressions:
+        print(f"\n⚠️ {len(regressions)} stage(s) slower than baseline by more than {REGRESSION_THRESHOLD}x:")
+        for r in regressions:
+            print(f"   {r['trucks']}x{r['jobs']} {r['stage']}: {r['baseline_min_s']}s -> {r['min_s']}s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
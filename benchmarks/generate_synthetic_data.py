@@ -0,0 +1,210 @@
+"""
+Generate synthetic api_out.json, truck.json and truck_location.json with
+the same schema as the real snapshots in database/json, for any fleet and
+job count, spread around the Milwaukee-area service footprint.
+
+Usage:
+    python generate_synthetic_data.py --trucks 100 --jobs 5000 --out-dir synthetic
+"""
+import argparse
+import json
+import os
+import random
+from datetime import date, timedelta
+
+# (latitude, longitude, city) cluster centers; jobs and trucks scatter around them
+SERVICE_AREAS = [
+    (43.0389, -87.9065, "Milwaukee"),
+    (43.0117, -88.2315, "Waukesha"),
+    (43.1789, -88.1173, "Menomonee Falls"),
+    (42.7261, -87.7829, "Racine"),
+    (42.5847, -87.8212, "Kenosha"),
+    (43.0731, -89.4012, "Madison"),
+    (43.4253, -88.1834, "West Bend"),
+    (43.1117, -88.4993, "Oconomowoc"),
+]
+AREA_SPREAD_DEGREES = 0.08
+HOME_YARD = (43.155268, -88.018533, "8613 W Calumet Rd, Milwaukee, WI 53224, USA", "Milwaukee")
+
+MATERIALS = ["Brown Enviro", "Hardwood Bark", "Woodchip - Certified", "Edging"]
+MATERIAL_WEIGHTS = [0.5, 0.35, 0.1, 0.05]
+JOB_TYPES = [
+    "HOA", "Church / Education / University", "Playground", "Residential",
+    "Apartment / Hotel", "Nursing / Senior Living", "Condominium / Townhomes",
+    "Hospitality / Retail", "Commercial / Industrial / Office", "Hospital / Medical", None
+]
+VENDORS = ["Meisters Forest Products", "Greencycle - Danville", "Hartland Materials"]
+CLIENTS = ["American Landscape", "KEI", "Pecatonica School District", "Brightview", "Ruppert Landscape"]
+DISPLAY_STATES = ["Stop", "Idle", "Moving"]
+
+MISSING_COORDS_RATE = 0.05  # the real board has a few jobs without a location
+NIGHT_ACCESS_RATE = 0.3
+
+
+def random_point(rng):
+    lat, lon, city = rng.choice(SERVICE_AREAS)
+    return (
+        round(rng.gauss(lat, AREA_SPREAD_DEGREES), 7),
+        round(rng.gauss(lon, AREA_SPREAD_DEGREES), 7),
+        city
+    )
+
+
+def make_job(rng, idx, status=""):
+    lat, lon, city = random_point(rng)
+    missing = rng.random() < MISSING_COORDS_RATE
+    return {
+        "Name": f"Synthetic Job {idx}",
+        "Client": rng.choice(CLIENTS),
+        "Status": status,
+        "Material": rng.choices(MATERIALS, MATERIAL_WEIGHTS)[0],
+        "Bid Qty": str(rng.randint(4, 150)),
+        "Job Type": rng.choice(JOB_TYPES),
+        "Latitude": None if missing else lat,
+        "Longitude": None if missing else lon,
+        "Address": f"{rng.randint(100, 9999)} Synthetic Rd, {city}, WI, USA",
+        "Night?": "✅ Yes" if rng.random() < NIGHT_ACCESS_RATE else "❌ No"
+    }
+
+
+def make_site(rng, idx, prefix):
+    lat, lon, city = random_point(rng)
+    return {
+        "Name": f"{prefix} {idx}",
+        "Client": "No client linked",
+        "Status": "",
+        "Material": "",
+        "Bid Qty": "",
+        "Job Type": None,
+        "Latitude": lat,
+        "Longitude": lon,
+        "Address": f"{rng.randint(100, 9999)} Supply Ave, {city}, WI, USA",
+        "Night?": "❌ No"
+    }
+
+
+def generate_api_out(rng, num_jobs):
+    in_progress = max(1, num_jobs // 6)
+    paused = max(1, num_jobs // 5)
+    return {
+        "In Progress": [make_job(rng, i, "In Progress") for i in range(in_progress)],
+        "Paused": [make_job(rng, in_progress + i, "Paused") for i in range(paused)],
+        "Jobs to be Scheduled": [make_job(rng, in_progress + paused + i) for i in range(num_jobs)],
+        "Material Vendors": [make_site(rng, i, "Vendor") for i in range(14)],
+        "Material Locations": [make_site(rng, i, "Material Location") for i in range(6)],
+        "Hotels": [make_site(rng, i, "Hotel") for i in range(10)]
+    }
+
+
+def truck_row(rng, name, day, qty_left="", material=""):
+    row = {
+        "Date": day.isoformat(),
+        "Dispatch Status": rng.choice(["Awaiting Dispatch", "Dispatched - Next Job"]),
+        "Load Status": rng.choice(["Awaiting Update", "Load Completed"]),
+        "Quantity Left on Truck": qty_left,
+        "Quantity Installed": "",
+        "Client": rng.choice(CLIENTS) if material else "",
+        "Job Name": f"Synthetic Job {rng.randint(0, 10_000)}" if material else "",
+        "Material Vendor": rng.choice(VENDORS) if material else "",
+        "Job Address": "",
+        "Material": material,
+        "Bid Qty": str(rng.randint(4, 150)) if material else "",
+        "Job Type": "",
+        "Job Conversion to Hours": "",
+        "Avg Qty Installed / Hour (Job)": "",
+        "Name": name
+    }
+    return row
+
+
+def truck_ids(num_trucks):
+    return [f"NS{i:02d}" for i in range(1, num_trucks + 1)]
+
+
+def generate_truck_boards(rng, num_trucks, today):
+    boards = []
+    for vehicle in truck_ids(num_trucks):
+        schedule = [truck_row(rng, "OFF", today + timedelta(days=1))]
+        review = []
+        for job_no in range(rng.randint(0, 3)):
+            material = rng.choices(MATERIALS[:3], MATERIAL_WEIGHTS[:3])[0]
+            qty_left = rng.choice(["", "0", str(float(rng.randint(1, 40)))])
+            review.append(truck_row(rng, f"Job {job_no + 1}", today, qty_left, material))
+        boards.append({"vehicle": vehicle, "group": "Schedule", "data": schedule})
+        boards.append({"vehicle": vehicle, "group": "Production Review", "data": review})
+    return boards
+
+
+def generate_truck_locations(rng, num_trucks, today):
+    locations = []
+    for vehicle in truck_ids(num_trucks):
+        if rng.random() < 0.5:
+            lat, lon, address, city = HOME_YARD
+            lat += rng.gauss(0, 0.0001)
+            lon += rng.gauss(0, 0.0001)
+        else:
+            lat, lon, city = random_point(rng)
+            address = f"{rng.randint(100, 9999)} Route Rd, {city}, WI, USA"
+        value = {
+            "Address": {
+                "AddressLine1": address,
+                "AddressLine2": "",
+                "Locality": city,
+                "AdministrativeArea": "WI",
+                "PostalCode": "53224",
+                "Country": "USA"
+            },
+            "DeltaDistance": 0.0,
+            "DeltaTime": rng.randint(0, 120),
+            "DeviceTimeZoneOffset": None,
+            "DeviceTimeZoneUseDST": True,
+            "DisplayState": rng.choice(DISPLAY_STATES),
+            "Direction": rng.randint(0, 359),
+            "Heading": "North",
+            "DriverNumber": None,
+            "GeoFenceName": None,
+            "Latitude": round(lat, 6),
+            "Longitude": round(lon, 6),
+            "Speed": 0.0,
+            "UpdateUTC": f"{today.isoformat()}T21:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}",
+            "IsPrivate": False
+        }
+        locations.append({
+            "VehicleNumber": vehicle,
+            "StatusCode": 200,
+            "ContentResource": {"Value": value, "StatusCode": 200}
+        })
+    return locations
+
+
+def generate(out_dir, num_trucks, num_jobs, seed=0):
+    """Write the three snapshot files to out_dir and return their paths."""
+    rng = random.Random(seed)
+    today = date(2025, 4, 18)
+    os.makedirs(out_dir, exist_ok=True)
+
+    outputs = {
+        "api_out.json": generate_api_out(rng, num_jobs),
+        "truck.json": generate_truck_boards(rng, num_trucks, today),
+        "truck_location.json": generate_truck_locations(rng, num_trucks, today)
+    }
+    paths = {}
+    for filename, data in outputs.items():
+        paths[filename] = os.path.join(out_dir, filename)
+        with open(paths[filename], "w") as f:
+            json.dump(data, f, indent=2)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic fleet/board snapshots.")
+    parser.add_argument("--trucks", type=int, default=50)
+    parser.add_argument("--jobs", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out-dir", default="synthetic")
+    args = parser.parse_args()
+
+    paths = generate(args.out_dir, args.trucks, args.jobs, args.seed)
+    print(f"✅ Wrote {args.trucks} trucks / {args.jobs} jobs to {args.out_dir}")
+    for path in paths.values():
+        print(f"   {path}")
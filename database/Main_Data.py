@@ -1,6 +1,8 @@
 import os
-import requests
+from monday_api import COMPLEXITY_FIELDS, budget, run_query, query_cost, column_values_selection
 import json
+from concurrent.futures import ThreadPoolExecutor
+import delta_sync
 from dotenv import load_dotenv
 from tabulate import tabulate
 import time
@@ -9,9 +11,17 @@ import time
 load_dotenv()
 
 # Configuration
-MONDAY_API_URL = "https://api.monday.com/v2"
 MONDAY_API_TOKEN = os.getenv("MONDAY_API_TOKEN")
 BOARD_ID = os.getenv("BOARD_ID")
+DEFAULT_PAGE_LIMIT = 500  # first page, before the per-item cost is known
+# Download only the groups the pipeline uses instead of the whole board (set to 0 to fetch everything)
+GROUP_SCOPED_FETCH = os.getenv("GROUP_SCOPED_FETCH", "1").lower() in ("1", "true", "yes")
+GROUP_FETCH_WORKERS = int(os.getenv("GROUP_FETCH_WORKERS", 4))
+# Last synced items + watermark, for SYNC_MODE=incremental (see delta_sync.py)
+STATE_PATH = "json/main_board_state.json"
+API_OUT_PATH = "json/api_out.json"
+
+CATEGORIES = ["In Progress", "Paused", "Jobs to be Scheduled", "Material Vendors", "Material Locations", "Hotels"]
 
 COLUMN_MAPPING = {
     'link_to_item1': 'Client',
@@ -30,6 +40,14 @@ COLUMN_MAPPING = {
     'check27': 'Night?' 
 }
 
+# Types of the mapped columns that parse_column_values reads through a typed fragment
+COLUMN_TYPES = {
+    'link_to_item1': 'board_relation',
+    'connect_boards': 'board_relation',
+    'location': 'location',
+    'location_column': 'location'
+}
+
 def debug_print(title, data):
     """Helper function for debug output"""
     print(f"\n{title}:")
@@ -39,6 +57,7 @@ def fetch_groups(board_id, api_key):
     """Fetch all groups and their IDs"""
     query = f"""
     {{
+      {COMPLEXITY_FIELDS}
       boards(ids: [{board_id}]) {{
         groups {{
           id
@@ -47,15 +66,7 @@ def fetch_groups(board_id, api_key):
       }}
     }}
     """
-    headers = {"Authorization": api_key}
-    response = requests.post(MONDAY_API_URL, json={"query": query}, headers=headers)
-    
-    if response.status_code != 200:
-        raise Exception(f"Groups API failed: {response.text}")
-
-    data = response.json()
-    if 'errors' in data:
-        raise Exception(f"Groups error: {data['errors'][0]['message']}")
+    data = run_query(query, api_key, label="Groups API")
 
     groups = {group['title']: group['id'] for group in data['data']['boards'][0]['groups']}
     return groups
@@ -64,6 +75,7 @@ def fetch_all_columns(board_id, api_key):
     """Fetch all columns in the board to inspect available fields"""
     query = f"""
     {{
+      {COMPLEXITY_FIELDS}
       boards(ids: [{board_id}]) {{
         columns {{
           id
@@ -73,88 +85,128 @@ def fetch_all_columns(board_id, api_key):
       }}
     }}
     """
-    headers = {"Authorization": api_key}
-    response = requests.post(MONDAY_API_URL, json={"query": query}, headers=headers)
-
-    if response.status_code != 200:
-        raise Exception(f"Columns API failed: {response.text}")
-
-    data = response.json()
+    data = run_query(query, api_key, label="Columns API")
     columns = data['data']['boards'][0]['columns']
     return columns
 
 def fetch_all_items(board_id, api_key):
-    """Fetch all items using pagination"""
+    """
+    Fetch all items using pagination, sizing pages to the complexity budget.
+    Raises on any failed page rather than returning a partial board.
+    """
     items = []
     cursor = None
-    try:
-        while True:
+    item_cost = None  # complexity points per item, measured from the first page
+    # Only the mapped columns, so pages stay small and cheap
+    columns = column_values_selection(list(COLUMN_MAPPING), COLUMN_TYPES)
+    while True:
+        limit = budget.page_limit(item_cost, DEFAULT_PAGE_LIMIT)
+        query = f"""
+        {{
+          {COMPLEXITY_FIELDS}
+          boards(ids: [{board_id}]) {{
+            items_page(limit: {limit}{f', cursor: "{cursor}"' if cursor else ''}) {{
+              cursor
+              items {{
+                id
+                name
+                group {{ id title }}
+                {columns}
+              }}
+            }}
+          }}
+        }}
+        """
+        data = run_query(query, api_key, label="Items API",
+                         estimated_cost=int((item_cost or 0) * limit))
+
+        # Handle case where the structure might not be as expected
+        if 'data' not in data or 'boards' not in data['data'] or not data['data']['boards']:
+            raise Exception("Unexpected API response structure")
+            
+        board_data = data['data']['boards'][0]
+        if 'items_page' not in board_data:
+            raise Exception("No items_page in board data")
+            
+        page_data = board_data['items_page']
+        if 'items' not in page_data:
+            break
+        
+        items.extend(page_data['items'])
+        if page_data['items']:
+            item_cost = query_cost(data) / limit
+
+        cursor = page_data.get('cursor')
+        if not cursor:
+            break  # No more pages left
+
+    return items
+
+def fetch_group_items(board_id, group_id, api_key):
+    """Fetch all items of one group: groups(ids: [...]) { items_page } first, then next_items_page"""
+    items = []
+    cursor = None
+    item_cost = None
+    columns = column_values_selection(list(COLUMN_MAPPING), COLUMN_TYPES)
+    while True:
+        limit = budget.page_limit(item_cost, DEFAULT_PAGE_LIMIT)
+        page_fields = f"""
+                cursor
+                items {{
+                  id
+                  name
+                  group {{ id title }}
+                  {columns}
+                }}
+        """
+        if cursor:
             query = f"""
             {{
+              {COMPLEXITY_FIELDS}
+              next_items_page(limit: {limit}, cursor: "{cursor}") {{ {page_fields} }}
+            }}
+            """
+        else:
+            query = f"""
+            {{
+              {COMPLEXITY_FIELDS}
               boards(ids: [{board_id}]) {{
-                items_page(limit: 500{f', cursor: "{cursor}"' if cursor else ''}) {{
-                  cursor
-                  items {{
-                    id
-                    name
-                    group {{ id title }}
-                    column_values {{
-                      id
-                      text
-                      value
-                      ... on BoardRelationValue {{
-                        linked_item_ids
-                        linked_items {{
-                          id
-                          name
-                        }}
-                      }}
-                      ... on LocationValue {{
-                        lat
-                        lng
-                        address
-                      }}
-                    }}
-                  }}
+                groups(ids: [{json.dumps(group_id)}]) {{
+                  items_page(limit: {limit}) {{ {page_fields} }}
                 }}
               }}
             }}
             """
-            headers = {"Authorization": api_key}
-            response = requests.post(MONDAY_API_URL, json={"query": query}, headers=headers)
-            
-            if response.status_code != 200:
-                raise Exception(f"Items API failed: {response.text}")
+        data = run_query(query, api_key, label=f"Items API ({group_id})",
+                         estimated_cost=int((item_cost or 0) * limit))
 
-            data = response.json()
-            
-            # Check for errors
-            if 'errors' in data:
-                raise Exception(f"API error: {data['errors'][0]['message']}")
-                
-            # Handle case where the structure might not be as expected
-            if 'data' not in data or 'boards' not in data['data'] or not data['data']['boards']:
-                raise Exception("Unexpected API response structure")
-                
-            board_data = data['data']['boards'][0]
-            if 'items_page' not in board_data:
-                raise Exception("No items_page in board data")
-                
-            page_data = board_data['items_page']
-            if 'items' not in page_data:
-                break
-            
-            items.extend(page_data['items'])
-            
-            cursor = page_data.get('cursor')
-            if not cursor:
-                break  # No more pages left
-    except Exception as e:
-        # If there's an error, return an empty list and log it
-        print(f"Error fetching items: {e}")
+        if cursor:
+            page_data = data['data']['next_items_page']
+        else:
+            groups = data['data']['boards'][0]['groups']
+            if not groups:
+                break  # group was deleted since fetch_groups
+            page_data = groups[0]['items_page']
+
+        items.extend(page_data['items'])
+        if page_data['items']:
+            item_cost = query_cost(data) / limit
+
+        cursor = page_data.get('cursor')
+        if not cursor:
+            break
 
     return items
 
+def fetch_items_by_group(board_id, group_ids, api_key):
+    """
+    Fetch only the given groups, concurrently; items come back in group_ids order.
+    Raises if any group fails, so a partial board is never mistaken for a complete one.
+    """
+    with ThreadPoolExecutor(max_workers=GROUP_FETCH_WORKERS) as pool:
+        pages = list(pool.map(lambda group_id: fetch_group_items(board_id, group_id, api_key), group_ids))
+    return [item for group_items in pages for item in group_items]
+
 def parse_column_values(column_values):
     """Parse column values, including linked client names and location details"""
     parsed = {}
@@ -197,87 +249,127 @@ def parse_column_values(column_values):
 
     return parsed
 
+def map_groups_to_categories(groups):
+    """Map group ids ({title: id} from fetch_groups) to api_out.json categories"""
+    group_to_category = {
+        groups.get("In Progress", ""): "In Progress",
+        groups.get("Paused", ""): "Paused",
+        groups.get("Material Vendor", ""): "Material Vendors",
+        groups.get("Material Locations", ""): "Material Locations",
+        groups.get("Hotel", ""): "Hotels"
+    }
+
+    # Handle "Jobs to be Scheduled" dynamically
+    for title, group_id in groups.items():
+        if title.startswith("Jobs to be Scheduled"):
+            group_to_category[group_id] = "Jobs to be Scheduled"
+    return group_to_category
+
+def job_row(item):
+    """api_out.json row for one item"""
+    parsed = parse_column_values(item['column_values'])
+    return {
+        "Name": item['name'],
+        "Client": parsed.get('Client', 'N/A'),
+        "Status": parsed.get('Status', 'N/A'),
+        "Material": parsed.get('Material', 'N/A'),
+        "Bid Qty": parsed.get('Bid Qty', 'N/A'),
+        "Job Type": parsed.get('Job Type', 'N/A'),
+        "Latitude": parsed.get('Latitude', 'N/A'),
+        "Longitude": parsed.get('Longitude', 'N/A'),
+        "Address": parsed.get('Address', 'N/A'),
+        "Night?": parsed.get('Night?', 'N/A')
+    }
+
+def categorize_items(items, group_to_category):
+    """Assign items to api_out.json categories using their group ids"""
+    categories = {category: [] for category in CATEGORIES}
+    for item in items:
+        category = group_to_category.get(item['group']['id'], None)
+        if category:
+            categories[category].append(job_row(item))
+    return categories
+
 # Export the necessary functions
-__all__ = ['fetch_groups', 'fetch_all_columns', 'fetch_all_items', 'parse_column_values']
+__all__ = ['fetch_groups', 'fetch_all_columns', 'fetch_all_items', 'fetch_group_items',
+           'fetch_items_by_group', 'parse_column_values', 'map_groups_to_categories', 'job_row',
+           'categorize_items', 'run']
 
-if __name__ == "__main__":
-    try:
-        print("=== DEBUGGING STARTED ===")
+def run():
+    """
+    Sync the main board and write api_out.json. Returns the categorized jobs.
+    Raises if the board can't be fetched, leaving the last api_out.json and
+    snapshot in place (sync_all_data retries the stage, then falls back to them).
+    """
+    print("=== DEBUGGING STARTED ===")
+
+    # 1. Fetch all groups with their IDs
+    print("\nStep 1: Fetching groups with IDs...")
+    groups = fetch_groups(BOARD_ID, MONDAY_API_TOKEN)
+
+    # print("\nStep 1.5: Fetching all columns...")
+    # all_columns = fetch_all_columns(BOARD_ID, MONDAY_API_TOKEN)
+
+    # Map group ids to categories
+    group_to_category = map_groups_to_categories(groups)
 
-        # 1. Fetch all groups with their IDs
-        print("\nStep 1: Fetching groups with IDs...")
-        groups = fetch_groups(BOARD_ID, MONDAY_API_TOKEN)
+    # 2. Fetch items: only what changed since the last sync in incremental mode,
+    # otherwise every item (only from the groups we keep unless GROUP_SCOPED_FETCH is off)
+    start_time = time.time()
+    started_at = delta_sync.utc_now()
+    state = delta_sync.load_state(STATE_PATH)
+    board_state = state["boards"].setdefault(str(BOARD_ID), {})
 
-        # print("\nStep 1.5: Fetching all columns...")
-        # all_columns = fetch_all_columns(BOARD_ID, MONDAY_API_TOKEN)
+    changed_ids = None
+    if not delta_sync.needs_full_sync(board_state):
+        changed_ids = delta_sync.fetch_changes({BOARD_ID: board_state["watermark"]}, MONDAY_API_TOKEN)[str(BOARD_ID)]
 
-        # 2. Fetch all items with pagination
+    if changed_ids is None:
+        # Fetch errors propagate, so a failed download never replaces the saved snapshot
         print("\nStep 2: Fetching all items (paginated)...")
-        start_time = time.time()
-        all_items = fetch_all_items(BOARD_ID, MONDAY_API_TOKEN)
-        end_time = time.time()
-        print(f"Time taken to fetch all items: {end_time - start_time} seconds")
-
-        # 3. Categorizing data into separate tables
-        print("\nStep 3: Categorizing data into separate tables...")
-
-        categories = {
-            "In Progress": [],
-            "Paused": [],
-            "Jobs to be Scheduled": [],
-            "Material Vendors": [],
-            "Material Locations": [],
-            "Hotels": []
-        }
-
-        # Map group titles to categories
-        group_to_category = {
-            groups.get("In Progress", ""): "In Progress",
-            groups.get("Paused", ""): "Paused",
-            groups.get("Material Vendor", ""): "Material Vendors",
-            groups.get("Material Locations", ""): "Material Locations",
-            groups.get("Hotel", ""): "Hotels"
-        }
-
-        # Handle "Jobs to be Scheduled" dynamically
-        for title, group_id in groups.items():
-            if title.startswith("Jobs to be Scheduled"):
-                group_to_category[group_id] = "Jobs to be Scheduled"
-
-        # Assign items to appropriate category using group IDs
-        for item in all_items:
-            group_id = item['group']['id']
-            category = group_to_category.get(group_id, None)
-
-            if category:
-                parsed = parse_column_values(item['column_values'])
-                row = {
-                    "Name": item['name'],
-                    "Client": parsed.get('Client', 'N/A'),
-                    "Status": parsed.get('Status', 'N/A'),
-                    "Material": parsed.get('Material', 'N/A'),
-                    "Bid Qty": parsed.get('Bid Qty', 'N/A'),
-                    "Job Type": parsed.get('Job Type', 'N/A'),
-                    "Latitude": parsed.get('Latitude', 'N/A'),
-                    "Longitude": parsed.get('Longitude', 'N/A'),
-                    "Address": parsed.get('Address', 'N/A'),
-                    "Night?": parsed.get('Night?', 'N/A')
-                }
-                categories[category].append(row)
-
-        # Print separate tables for each category
-        for category, data in categories.items():
-            if data:
-                print(f"\n{category} Jobs:")
-                print(tabulate(data, headers="keys", tablefmt="grid"))
-            else:
-                print(f"\nNo data found for {category}. But group exists!")
-        # Save to JSON
-        with open("json/api_out.json", "w") as f:
-            json.dump(categories, f, indent=2)
-        print("✅ Saved job data to api_out.json")
+        if GROUP_SCOPED_FETCH:
+            wanted_groups = [group_id for group_id in group_to_category if group_id]
+            all_items = fetch_items_by_group(BOARD_ID, wanted_groups, MONDAY_API_TOKEN)
+        else:
+            all_items = fetch_all_items(BOARD_ID, MONDAY_API_TOKEN)
+        delta_sync.record_full_sync(board_state, all_items, started_at)
+    else:
+        print(f"\nStep 2: Fetching {len(changed_ids)} changed items...")
+        columns = column_values_selection(list(COLUMN_MAPPING), COLUMN_TYPES)
+        fetched = delta_sync.fetch_items(changed_ids, columns, MONDAY_API_TOKEN)
+        removed = delta_sync.apply_changes(board_state, BOARD_ID, changed_ids, fetched, started_at)
+        delta_sync.queue_deleted_jobs([item['name'] for item in removed])
+        print(f"🔁 {len(changed_ids)} items refreshed, {len(removed)} removed")
+        all_items = list(board_state["items"].values())
+
+    board_state["groups"] = groups  # lets the webhook rebuild api_out.json without refetching
+    delta_sync.save_state(STATE_PATH, state)
+    end_time = time.time()
+    print(f"Time taken to fetch all items: {end_time - start_time} seconds")
+
+    # 3. Categorizing data into separate tables
+    print("\nStep 3: Categorizing data into separate tables...")
+
+    categories = categorize_items(all_items, group_to_category)
+
+    # Print separate tables for each category
+    for category, data in categories.items():
+        if data:
+            print(f"\n{category} Jobs:")
+            print(tabulate(data, headers="keys", tablefmt="grid"))
+        else:
+            print(f"\nNo data found for {category}. But group exists!")
+    # Save to JSON
+    with open(API_OUT_PATH, "w") as f:
+        json.dump(categories, f, indent=2)
+    print("✅ Saved job data to api_out.json")
 
-        print("\n=== DEBUGGING COMPLETE ===")
+    print("\n=== DEBUGGING COMPLETE ===")
+    return categories
 
+
+if __name__ == "__main__":
+    try:
+        run()
     except Exception as e:
         print(f"\nCritical Error: {e}")
@@ -1,6 +1,12 @@
 import os
-import requests
+from monday_api import (
+    COMPLEXITY_FIELDS, MAX_BUDGET_RETRIES, ComplexityBudgetExhausted, budget, run_query, query_cost, column_values_selection
+)
 import json
+import heapq
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import delta_sync
 from dotenv import load_dotenv
 from tabulate import tabulate
 import time
@@ -9,8 +15,15 @@ import time
 load_dotenv()
 
 # 2. Basic configs
-MONDAY_API_URL = "https://api.monday.com/v2"
 MONDAY_API_TOKEN = os.getenv("MONDAY_API_TOKEN")
+DEFAULT_PAGE_LIMIT = 100  # first page, before the per-item cost is known
+BOARD_FETCH_WORKERS = int(os.getenv("BOARD_FETCH_WORKERS", 4))  # boards paged in parallel
+MIN_THROTTLE_WAIT_SECONDS = 1  # floor on the wait before retrying a throttled page
+# Download only ALLOWED_GROUP_TITLES instead of every group on each board (set to 0 to fetch whole boards)
+GROUP_SCOPED_FETCH = os.getenv("GROUP_SCOPED_FETCH", "1").lower() in ("1", "true", "yes")
+# Last synced items + watermark per board, for SYNC_MODE=incremental (see delta_sync.py)
+STATE_PATH = "json/truck_board_state.json"
+TRUCK_JSON_PATH = "json/truck.json"
 
 # 3. Your truck boards (board IDs)
 TRUCK_BOARDS = {
@@ -70,6 +83,7 @@ def fetch_groups(board_id, api_key):
     """Get all groups for a given board."""
     query = f"""
     {{
+      {COMPLEXITY_FIELDS}
       boards(ids: [{board_id}]) {{
         groups {{
           id
@@ -78,11 +92,7 @@ def fetch_groups(board_id, api_key):
       }}
     }}
     """
-    headers = {"Authorization": api_key}
-    response = requests.post(MONDAY_API_URL, json={"query": query}, headers=headers)
-    data = response.json()
-    if "errors" in data:
-        raise Exception(f"fetch_groups Error: {data['errors'][0]['message']}")
+    data = run_query(query, api_key, label="fetch_groups")
 
     groups_list = data["data"]["boards"][0]["groups"]
     groups_dict = {g["title"]: g["id"] for g in groups_list}
@@ -93,6 +103,7 @@ def fetch_columns(board_id, api_key):
     """Fetch all columns (id, title, type) for inspection."""
     query = f"""
     {{
+      {COMPLEXITY_FIELDS}
       boards(ids: [{board_id}]) {{
         columns {{
           id
@@ -102,79 +113,54 @@ def fetch_columns(board_id, api_key):
       }}
     }}
     """
-    headers = {"Authorization": api_key}
-    response = requests.post(MONDAY_API_URL, json={"query": query}, headers=headers)
-    data = response.json()
-    if "errors" in data:
-        raise Exception(f"fetch_columns Error: {data['errors'][0]['message']}")
+    data = run_query(query, api_key, label="fetch_columns")
     
     columns = data["data"]["boards"][0]["columns"]
     debug_print(f"Columns for Board {board_id}", columns)
     return columns
 
-def fetch_items_paginated(board_id, api_key):
+def fetch_items_paginated(board_id, api_key, column_types=None):
     """
-    Fetch all items from the given board using pagination.
-    NOTE: We include the necessary fragments to handle mirror & connect columns:
-      ... on MirrorValue { display_value }
-      ... on BoardRelationValue { linked_item_ids, linked_items { id name } }
+    Fetch all items from the given board using pagination, sizing each page
+    to what's left of the shared complexity budget.
+    Only TRUCK_COLUMN_MAPPING columns are requested. column_types ({id: type},
+    from fetch_columns) limits the MirrorValue / BoardRelationValue /
+    LocationValue fragments to the types those columns actually have.
     """
     items = []
     cursor = None
     page_num = 0
+    item_cost = None  # complexity points per item, measured from the first page
+    columns = column_values_selection(list(TRUCK_COLUMN_MAPPING), column_types)
 
     while True:
         page_num += 1
+        limit = budget.page_limit(item_cost, DEFAULT_PAGE_LIMIT)
         query = f"""
         {{
+          {COMPLEXITY_FIELDS}
           boards(ids: [{board_id}]) {{
-            items_page(limit: 100{f', cursor: "{cursor}"' if cursor else ''}) {{
+            items_page(limit: {limit}{f', cursor: "{cursor}"' if cursor else ''}) {{
               cursor
               items {{
                 id
                 name
                 group {{ id title }}
-                column_values {{
-                  id
-                  text
-                  value
-
-                  # Location columns
-                  ... on LocationValue {{
-                    lat
-                    lng
-                  }}
-
-                  # Mirror columns
-                  ... on MirrorValue {{
-                    display_value
-                  }}
-
-                  # Connect boards columns
-                  ... on BoardRelationValue {{
-                    linked_item_ids
-                    linked_items {{
-                      id
-                      name
-                    }}
-                  }}
-                }}
+                {columns}
               }}
             }}
           }}
         }}
         """
-        headers = {"Authorization": api_key}
-        response = requests.post(MONDAY_API_URL, json={"query": query}, headers=headers)
-        data = response.json()
-        
-        if "errors" in data:
-            raise Exception(f"fetch_items_paginated Error: {data['errors'][0]['message']}")
-        
+        data = run_query(query, api_key, label="fetch_items_paginated",
+                         estimated_cost=int((item_cost or 0) * limit))
+
         board_data = data["data"]["boards"][0]
         page_data = board_data["items_page"]
         new_items = page_data["items"]
         items.extend(new_items)
+        if new_items:
+            item_cost = query_cost(data) / limit
 
         debug_print(f"Page #{page_num} Items for Board {board_id}", [i["id"] for i in new_items])
         
@@ -185,6 +171,255 @@ def fetch_items_paginated(board_id, api_key):
     debug_print(f"Total Items Fetched for Board {board_id}", len(items))
     return items
 
+def fetch_next_page(board_id, cursor, api_key, column_types, item_cost):
+    """
+    Fetch one next_items_page for a board without waiting on the complexity
+    budget (raises ComplexityBudgetExhausted instead).
+    Returns (items, next cursor, measured cost per item).
+    """
+    limit = budget.page_limit(item_cost, DEFAULT_PAGE_LIMIT, block=False)
+    columns = column_values_selection(list(TRUCK_COLUMN_MAPPING), column_types)
+    query = f"""
+    {{
+      {COMPLEXITY_FIELDS}
+      next_items_page(limit: {limit}, cursor: "{cursor}") {{
+        cursor
+        items {{
+          id
+          name
+          group {{ id title }}
+          {columns}
+        }}
+      }}
+    }}
+    """
+    data = run_query(query, api_key, label=f"next_items_page ({board_id})",
+                     estimated_cost=int((item_cost or 0) * limit), block=False)
+
+    page_data = data["data"]["next_items_page"]
+    if page_data["items"]:
+        item_cost = query_cost(data) / limit
+    return page_data["items"], page_data.get("cursor"), item_cost
+
+def page_boards_concurrently(boards, streams, api_key, item_cost):
+    """
+    Follow every stream's cursor on a pool of BOARD_FETCH_WORKERS threads,
+    one page per task. A stream is one board's items_page (or one group's,
+    in group-scoped mode): {"board_id", "cursor", "items"}; pages are
+    appended to its "items".
+
+    A board that hits the complexity budget gives its worker back and is
+    queued again for when the budget resets, so the other boards keep going.
+    A page Monday rejects MAX_BUDGET_RETRIES times in a row fails its board;
+    waits for the local budget (nothing sent yet) don't count.
+    Each stream has at most one page in flight, so its items stay in order.
+    Returns the ids of boards that had a page fail.
+    """
+    ready = deque((key, stream["cursor"], item_cost) for key, stream in streams.items() if stream["cursor"])
+    delayed = []  # heap of (ready_at, seq, key, cursor, item_cost)
+    running = {}
+    failed = set()
+    throttled = {}  # key -> times Monday rejected the stream's current page
+    seq = 0
+
+    with ThreadPoolExecutor(max_workers=BOARD_FETCH_WORKERS) as pool:
+        while ready or delayed or running:
+            now = time.monotonic()
+            while delayed and delayed[0][0] <= now:
+                ready.append(heapq.heappop(delayed)[2:])
+
+            while ready and len(running) < BOARD_FETCH_WORKERS:
+                key, cursor, cost = ready.popleft()
+                board_id = streams[key]["board_id"]
+                if board_id in failed:
+                    continue
+                future = pool.submit(fetch_next_page, board_id, cursor, api_key,
+                                     boards[board_id]["column_types"], cost)
+                running[future] = (key, cursor, cost)
+
+            if not running:
+                if delayed:
+                    time.sleep(max(0.0, delayed[0][0] - time.monotonic()))
+                continue
+
+            timeout = max(0.0, delayed[0][0] - time.monotonic()) if delayed else None
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                key, cursor, cost = running.pop(future)
+                board_id = streams[key]["board_id"]
+                try:
+                    items, next_cursor, cost = future.result()
+                except ComplexityBudgetExhausted as e:
+                    if e.from_server:
+                        throttled[key] = throttled.get(key, 0) + 1
+                    if throttled.get(key, 0) >= MAX_BUDGET_RETRIES:
+                        print(f"❌ Board {board_id} still throttled after {MAX_BUDGET_RETRIES} attempts")
+                        failed.add(board_id)
+                        continue
+                    retry_in = max(e.reset_in_seconds, MIN_THROTTLE_WAIT_SECONDS)
+                    debug_print(f"Board {board_id} throttled", f"retrying in {retry_in:.1f}s")
+                    seq += 1
+                    heapq.heappush(delayed, (time.monotonic() + retry_in, seq, key, cursor, cost))
+                    continue
+                except Exception as e:
+                    print(f"❌ Error paging board {board_id}: {e}")
+                    failed.add(board_id)
+                    continue
+
+                throttled.pop(key, None)
+                streams[key]["items"].extend(items)
+                if next_cursor:
+                    ready.append((key, next_cursor, cost))
+
+    return failed
+
+def fetch_boards_batched(board_ids, api_key, group_titles=None):
+    """
+    Fetch groups, column types and all items for several boards at once.
+
+    Duplicate board ids are fetched once. A single boards(ids: [...]) query
+    returns every board's groups, columns and first items page; the boards
+    that have more pages then follow their cursors in parallel
+    (page_boards_concurrently).
+
+    With group_titles, only items in those groups are downloaded: the first
+    query returns just groups and columns, and a second one asks each board
+    for groups(ids: [...]) { items_page } of its matching groups, so older
+    groups on the board are never transferred.
+
+    Returns {board_id: {"groups": {title: id}, "column_types": {id: type}, "items": [...]}}.
+    Boards missing from the response (deleted or no access) or whose later
+    pages fail are left out.
+    """
+    unique_ids = list(dict.fromkeys(str(b) for b in board_ids))
+    # Column types aren't known before the first query, so the first pages carry every fragment
+    columns = column_values_selection(list(TRUCK_COLUMN_MAPPING))
+    items_page = f"""
+        items_page(limit: {DEFAULT_PAGE_LIMIT}) {{
+          cursor
+          items {{
+            id
+            name
+            group {{ id title }}
+            {columns}
+          }}
+        }}
+    """
+    query = f"""
+    {{
+      {COMPLEXITY_FIELDS}
+      boards(ids: [{", ".join(unique_ids)}], limit: {len(unique_ids)}) {{
+        id
+        groups {{ id title }}
+        columns {{ id type }}
+        {"" if group_titles else items_page}
+      }}
+    }}
+    """
+    data = run_query(query, api_key, label="fetch_boards_batched")
+
+    boards = {}
+    streams = {}
+    for board in data["data"]["boards"]:
+        boards[board["id"]] = {
+            "groups": {g["title"]: g["id"] for g in board["groups"]},
+            "column_types": {c["id"]: c["type"] for c in board["columns"]},
+            "items": []
+        }
+        if not group_titles:
+            streams[board["id"]] = {
+                "board_id": board["id"],
+                "cursor": board["items_page"].get("cursor"),
+                "items": board["items_page"]["items"]
+            }
+    pages_requested = DEFAULT_PAGE_LIMIT * len(boards)
+
+    if group_titles:
+        # One aliased field per board so each only gets its own group ids
+        wanted = {
+            board_id: [board["groups"][t] for t in group_titles if t in board["groups"]]
+            for board_id, board in boards.items()
+        }
+        wanted = {board_id: group_ids for board_id, group_ids in wanted.items() if group_ids}
+        board_fields = "\n".join(
+            f"""b{board_id}: boards(ids: [{board_id}]) {{
+              groups(ids: [{", ".join(json.dumps(g) for g in group_ids)}]) {{
+                id
+                {items_page}
+              }}
+            }}"""
+            for board_id, group_ids in wanted.items()
+        )
+        pages_requested = DEFAULT_PAGE_LIMIT * sum(len(g) for g in wanted.values())
+        data = {"data": {}}
+        if wanted:
+            data = run_query(f"{{ {COMPLEXITY_FIELDS} {board_fields} }}", api_key,
+                             label="fetch_boards_batched (groups)")
+
+        for board_id, group_ids in wanted.items():
+            pages = {g["id"]: g["items_page"] for g in data["data"][f"b{board_id}"][0]["groups"]}
+            for group_id in group_ids:
+                page = pages.get(group_id, {"cursor": None, "items": []})
+                streams[(board_id, group_id)] = {
+                    "board_id": board_id,
+                    "cursor": page.get("cursor"),
+                    "items": page["items"]
+                }
+
+    item_cost = query_cost(data) / pages_requested if pages_requested and data["data"] else None
+    failed = page_boards_concurrently(boards, streams, api_key, item_cost)
+
+    for stream in streams.values():
+        boards[stream["board_id"]]["items"].extend(stream["items"])
+    for board_id in failed:
+        # Drop the board rather than report a partial item list as complete
+        del boards[board_id]
+
+    for board_id, board in boards.items():
+        debug_print(f"Total Items Fetched for Board {board_id}", len(board["items"]))
+    return boards
+
+def sync_boards(board_ids, api_key, state):
+    """
+    Bring each board's snapshot in `state` up to date and return them in
+    fetch_boards_batched's shape. Boards due a full sync (see delta_sync)
+    are downloaded in one batch; the rest only refetch the items their
+    activity log mentions since the watermark.
+    """
+    unique_ids = list(dict.fromkeys(str(b) for b in board_ids))
+    started_at = delta_sync.utc_now()
+    board_states = {b: state["boards"].setdefault(b, {}) for b in unique_ids}
+
+    incremental = {b: s["watermark"] for b, s in board_states.items() if not delta_sync.needs_full_sync(s)}
+    changes = delta_sync.fetch_changes(incremental, api_key) if incremental else {}
+    full_ids = [b for b in unique_ids if changes.get(b) is None]
+
+    synced = set()
+    if full_ids:
+        fetched = fetch_boards_batched(full_ids, api_key, ALLOWED_GROUP_TITLES if GROUP_SCOPED_FETCH else None)
+        for board_id, board in fetched.items():
+            delta_sync.record_full_sync(board_states[board_id], board["items"], started_at,
+                                        groups=board["groups"], column_types=board["column_types"])
+            synced.add(board_id)
+
+    changed_ids = set().union(*(ids for ids in changes.values() if ids))
+    if changed_ids:
+        columns = column_values_selection(list(TRUCK_COLUMN_MAPPING))
+        fetched_items = delta_sync.fetch_items(changed_ids, columns, api_key)
+    for board_id, ids in changes.items():
+        if ids is None:
+            continue
+        removed = []
+        if ids:
+            removed = delta_sync.apply_changes(board_states[board_id], board_id, ids, fetched_items, started_at)
+        else:
+            board_states[board_id]["watermark"] = started_at
+        print(f"🔁 Board {board_id}: {len(ids)} items refreshed, {len(removed)} removed")
+        synced.add(board_id)
+
+    boards = boards_from_state(state)
+    return {board_id: boards[board_id] for board_id in unique_ids if board_id in synced}
+
 # ---------------------------------------------------
 # PARSING FUNCTION
 # ---------------------------------------------------
@@ -234,103 +469,120 @@ def parse_column_values(column_values):
     return parsed
 
 # ---------------------------------------------------
-# MAIN SCRIPT
+# OUTPUT
 # ---------------------------------------------------
-if __name__ == "__main__":
-    try:
-        print("🚚 Truck Dashboard: Unified Multi-Board Report")
 
-        full_output = []  # Collect all truck board data here
+def build_truck_output(boards, verbose=True):
+    """
+    Build truck.json entries ({vehicle, group, data}) in TRUCK_BOARDS order,
+    fanning each board out to every vehicle that uses it.
+    boards: {board_id: {"groups": {title: id}, "items": [...]}}.
+    With verbose, print a table per vehicle and group as well.
+    """
+    full_output = []  # Collect all truck board data here
 
-        # Loop over each truck board
-        for team_name, board_id in TRUCK_BOARDS.items():
+    for team_name, board_id in TRUCK_BOARDS.items():
+        if verbose:
             print(f"\n================= 🛻 {team_name} (Board ID: {board_id}) =================")
 
-            try:
-                # 1. Fetch groups
-                groups_dict = fetch_groups(board_id, MONDAY_API_TOKEN)
-
-                # 2. Filter only the groups we need
-                allowed_groups = {k: v for k, v in groups_dict.items() if k in ALLOWED_GROUP_TITLES}
-
-                # 3. Optionally fetch columns to confirm structure
-                fetch_columns(board_id, MONDAY_API_TOKEN)
-
-                # 4. Fetch items (paginated) with expanded fragments
-                start_time = time.time()
-                MAX_RETRIES = 3
-                WAIT_SECONDS = 60
-
-                for attempt in range(MAX_RETRIES):
-                    try:
-                        all_items = fetch_items_paginated(board_id, MONDAY_API_TOKEN)
-                        break
-                    except Exception as e:
-                        if "Complexity budget exhausted" in str(e):
-                            print(f"⚠️ Attempt {attempt+1}/{MAX_RETRIES} failed for {team_name} due to complexity limits.")
-                            if attempt < MAX_RETRIES - 1:
-                                print(f"🔁 Retrying {team_name} in {WAIT_SECONDS} seconds...")
-                                time.sleep(WAIT_SECONDS)
-                            else:
-                                print(f"❌ Skipping board {team_name} after {MAX_RETRIES} failed attempts.")
-                                all_items = []  # prevent crash later
-                        else:
-                            raise
-
-                end_time = time.time()
-                print(f"Time taken to fetch items: {end_time - start_time:.2f} seconds")
-
-                # 5. Filter items by group & parse columns
-                grouped_data = {grp_title: [] for grp_title in allowed_groups.keys()}
-
-                for item in all_items:
-                    grp_title = item["group"]["title"]
-                    if grp_title in allowed_groups:
-                        parsed_dict = parse_column_values(item["column_values"])
-                        parsed_dict["Name"] = item["name"]
-                        grouped_data[grp_title].append(parsed_dict)
-
-                # 6. Print tables and collect data
-                for group_title, rows in grouped_data.items():
-                    if rows:
-                        print(f"\n📦 {team_name} - {group_title}:")
-                        all_keys = set()
-                        for r in rows:
-                            all_keys.update(r.keys())
-
-                        desired_order = ["Name"] + list(TRUCK_COLUMN_MAPPING.values())
-                        columns_in_use = [c for c in desired_order if c in all_keys]
-
-                        table_data = []
-                        for r in rows:
-                            row_data = [r.get(col, "") for col in columns_in_use]
-                            table_data.append(row_data)
-
-                        print(tabulate(table_data, headers=columns_in_use, tablefmt="grid"))
-
-                        # Save the data into output structure
-                        full_output.append({
-                            "vehicle": team_name,
-                            "group": group_title,
-                            "data": rows
-                        })
-                    else:
-                        print(f"\n🚫 No data in group: {group_title}")
-
-                        # Save the data into output structure
-                        full_output.append({
-                            "vehicle": team_name,
-                            "group": group_title,
-                            "data": rows
-                        })
-
-            except Exception as e:
-                print(f"❌ Error processing board {team_name} (ID {board_id}): {e}")
-
-        # ✅ Save all truck board data to JSON
-        with open("json/truck.json", "w") as f:
-            json.dump(full_output, f, indent=2)
-            print("\n✅ Saved truck board data to truck.json")
+        try:
+            board = boards.get(board_id)
+            if board is None:
+                raise Exception("board not returned by the API")
+
+            # Filter only the groups we need
+            allowed_groups = {k: v for k, v in board["groups"].items() if k in ALLOWED_GROUP_TITLES}
+
+            # Filter items by group & parse columns
+            grouped_data = {grp_title: [] for grp_title in allowed_groups.keys()}
+
+            for item in board["items"]:
+                grp_title = item["group"]["title"]
+                if grp_title in allowed_groups:
+                    parsed_dict = parse_column_values(item["column_values"])
+                    parsed_dict["Name"] = item["name"]
+                    grouped_data[grp_title].append(parsed_dict)
+
+            # Print tables and collect data
+            for group_title, rows in grouped_data.items():
+                if verbose and rows:
+                    print(f"\n📦 {team_name} - {group_title}:")
+                    all_keys = set()
+                    for r in rows:
+                        all_keys.update(r.keys())
+
+                    desired_order = ["Name"] + list(TRUCK_COLUMN_MAPPING.values())
+                    columns_in_use = [c for c in desired_order if c in all_keys]
+
+                    table_data = []
+                    for r in rows:
+                        row_data = [r.get(col, "") for col in columns_in_use]
+                        table_data.append(row_data)
+
+                    print(tabulate(table_data, headers=columns_in_use, tablefmt="grid"))
+                elif verbose:
+                    print(f"\n🚫 No data in group: {group_title}")
+
+                # Save the data into output structure
+                full_output.append({
+                    "vehicle": team_name,
+                    "group": group_title,
+                    "data": rows
+                })
+
+        except Exception as e:
+            print(f"❌ Error processing board {team_name} (ID {board_id}): {e}")
+
+    return full_output
+
+def boards_from_state(state):
+    """fetch_boards_batched-shaped boards from a truck_board_state.json snapshot"""
+    return {
+        board_id: {
+            "groups": board_state["groups"],
+            "column_types": board_state.get("column_types", {}),
+            "items": list(board_state["items"].values())
+        }
+        for board_id, board_state in state["boards"].items() if "items" in board_state
+    }
 
+# ---------------------------------------------------
+# MAIN SCRIPT
+# ---------------------------------------------------
+def run():
+    """
+    Sync every truck board and write truck.json. Returns the truck.json entries.
+    Raises if any board couldn't be fetched; the boards that did sync keep
+    their updated snapshots, but truck.json is left as it was.
+    """
+    print("🚚 Truck Dashboard: Unified Multi-Board Report")
+
+    # 1. Sync every distinct board once (NS02 and NS10 share a board): a batched
+    # full download, or only what changed since the last run with SYNC_MODE=incremental.
+    # run_query waits out the complexity budget reset and retries on its own.
+    start_time = time.time()
+    state = delta_sync.load_state(STATE_PATH)
+    boards = sync_boards(TRUCK_BOARDS.values(), MONDAY_API_TOKEN, state)
+    delta_sync.save_state(STATE_PATH, state)
+    end_time = time.time()
+    print(f"Time taken to fetch {len(boards)} boards: {end_time - start_time:.2f} seconds")
+
+    missing = set(TRUCK_BOARDS.values()) - set(boards)
+    if missing:
+        raise Exception(f"Boards not fetched: {', '.join(sorted(missing))}")
+
+    # 2. Fan each board out to every vehicle that uses it
+    full_output = build_truck_output(boards)
+
+    # ✅ Save all truck board data to JSON
+    with open(TRUCK_JSON_PATH, "w") as f:
+        json.dump(full_output, f, indent=2)
+        print("\n✅ Saved truck board data to truck.json")
+    return full_output
+
+
+if __name__ == "__main__":
+    try:
+        run()
     except Exception as global_e:
         print(f"\n❌ Global Error: {global_e}")
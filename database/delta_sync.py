@@ -0,0 +1,179 @@
+"""
+Incremental Monday sync state shared by Main_Data and Team_Data.
+
+Each board's last snapshot is kept as raw Monday items keyed by item id,
+together with a high-watermark (when the last sync started) and the time of
+the last full download. In incremental mode a sync reads the board's
+activity log since the watermark, refetches only the items it mentions with
+items(ids: [...]), and drops the ones that come back deleted, archived or
+moved to another board. Structural events (groups/columns changing) or a
+log too long to read in one page fall back to a full download, and so does
+any board whose last full download is older than FULL_RECONCILE_HOURS.
+"""
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+from monday_api import COMPLEXITY_FIELDS, run_query
+
+# "full" re-downloads every board; "incremental" applies changes since the watermark
+SYNC_MODE = os.getenv("SYNC_MODE", "full").lower()
+FULL_RECONCILE_HOURS = float(os.getenv("FULL_RECONCILE_HOURS", 24))
+
+# Re-read a little of the log before the watermark so clock skew can't lose an event
+WATERMARK_OVERLAP_SECONDS = 120
+ACTIVITY_LOG_LIMIT = 1000  # a full page means too much changed; do a full sync instead
+ITEMS_PER_QUERY = 100  # items(ids: [...]) maximum
+
+# Deleted job names waiting for sync_jobs_data to remove them from the database
+DELETED_JOBS_PATH = "json/deleted_jobs.json"
+
+
+def utc_now():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _parse_time(value):
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+
+
+def load_state(path):
+    if not os.path.exists(path):
+        return {"boards": {}}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_state(path, state):
+    # Write then rename so a crash mid-write can't leave half a state file behind
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def needs_full_sync(board_state):
+    """True when there's no usable watermark or the periodic full reconcile is due."""
+    if SYNC_MODE != "incremental" or not board_state.get("watermark") or not board_state.get("full_sync_at"):
+        return True
+    age = datetime.now(timezone.utc) - _parse_time(board_state["full_sync_at"])
+    return age > timedelta(hours=FULL_RECONCILE_HOURS)
+
+
+def record_full_sync(board_state, items, started_at, **extra):
+    """Replace a board's snapshot with a full download that began at started_at."""
+    board_state.clear()
+    board_state.update(extra)
+    board_state["items"] = {item["id"]: item for item in items}
+    board_state["watermark"] = started_at
+    board_state["full_sync_at"] = started_at
+
+
+def fetch_changes(watermarks, api_key):
+    """
+    Read the activity logs of several boards since their watermarks.
+
+    watermarks: {board_id: ISO time}. Returns {board_id: set of item ids},
+    or None for a board that needs a full sync (structural change, or more
+    events than fit in one page). Boards the API doesn't return map to None too.
+    """
+    since = min(_parse_time(w) for w in watermarks.values()) - timedelta(seconds=WATERMARK_OVERLAP_SECONDS)
+    query = f"""
+    {{
+      {COMPLEXITY_FIELDS}
+      boards(ids: [{", ".join(str(b) for b in watermarks)}], limit: {len(watermarks)}) {{
+        id
+        activity_logs(from: "{since.strftime('%Y-%m-%dT%H:%M:%SZ')}", limit: {ACTIVITY_LOG_LIMIT}) {{
+          event
+          data
+        }}
+      }}
+    }}
+    """
+    data = run_query(query, api_key, label="activity_logs")
+
+    changes = {str(board_id): None for board_id in watermarks}
+    for board in data["data"]["boards"]:
+        logs = board["activity_logs"] or []
+        if len(logs) >= ACTIVITY_LOG_LIMIT:
+            continue
+
+        item_ids = set()
+        for log in logs:
+            try:
+                event_data = json.loads(log.get("data") or "{}")
+            except json.JSONDecodeError:
+                event_data = {}
+            pulse_ids = event_data.get("pulse_ids") or [event_data.get("pulse_id")]
+            pulse_ids = [str(p) for p in pulse_ids if p]
+            if not pulse_ids:
+                # Not about a single item (group/column/board change): can't patch it in place
+                print(f"🔄 Board {board['id']}: '{log['event']}' needs a full sync")
+                item_ids = None
+                break
+            item_ids.update(pulse_ids)
+
+        changes[board["id"]] = item_ids
+    return changes
+
+
+def fetch_items(item_ids, columns, api_key):
+    """
+    Fetch items by id in chunks of ITEMS_PER_QUERY. `columns` is the
+    column_values selection the board's fetcher uses.
+    Returns {item_id: item}; items Monday no longer has are simply absent.
+    """
+    item_ids = sorted(item_ids, key=int)
+    items = {}
+    for start in range(0, len(item_ids), ITEMS_PER_QUERY):
+        chunk = item_ids[start:start + ITEMS_PER_QUERY]
+        query = f"""
+        {{
+          {COMPLEXITY_FIELDS}
+          items(ids: [{", ".join(chunk)}], limit: {len(chunk)}) {{
+            id
+            name
+            state
+            board {{ id }}
+            group {{ id title }}
+            {columns}
+          }}
+        }}
+        """
+        data = run_query(query, api_key, label="items")
+        for item in data["data"]["items"] or []:
+            items[item["id"]] = item
+    return items
+
+
+def apply_changes(board_state, board_id, item_ids, fetched, started_at=None):
+    """
+    Merge refetched items into a board's snapshot and, given started_at,
+    advance its watermark (a webhook refresh of one item leaves it alone so
+    the next incremental sync still catches anything else that changed).
+    An item that is gone, no longer active or now on another board is
+    removed. Returns the removed items.
+    """
+    items = board_state["items"]
+    removed = []
+    for item_id in item_ids:
+        item = fetched.get(item_id)
+        if item and item.get("state", "active") == "active" and str(item["board"]["id"]) == str(board_id):
+            items[item_id] = {key: value for key, value in item.items() if key not in ("state", "board")}
+        elif item_id in items:
+            removed.append(items.pop(item_id))
+    if started_at:
+        board_state["watermark"] = started_at
+    return removed
+
+
+def queue_deleted_jobs(names, path=DELETED_JOBS_PATH):
+    """Add job names for sync_jobs_data to delete from the database."""
+    if not names:
+        return
+    pending = []
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            pending = json.load(f)
+    with open(path, "w") as f:
+        json.dump(sorted(set(pending) | set(names)), f, indent=2)
@@ -0,0 +1,101 @@
+"""
+Shared HTTP session for the Monday, Verizon Connect and Groq callers.
+
+One process-wide requests.Session keeps a keep-alive connection pool per
+host, so paginated board calls reuse the same TCP+TLS connection instead
+of handshaking on every request. Each host gets its own connect/read
+timeouts and retry policy; unknown hosts fall back to DEFAULT_POLICY.
+"""
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+SERVER_ERROR_STATUSES = (500, 502, 503, 504)
+
+DEFAULT_POLICY = {
+    "timeout": (5, 30),  # (connect, read) seconds
+    "retries": 3,
+    "backoff": 1.0,
+    "pool_size": 10,
+    "retry_reads": True,  # resend after a read timeout (only safe if the call is idempotent)
+    "retry_methods": ("GET", "POST"),  # methods retried on read errors and retry_statuses
+    "retry_statuses": RETRY_STATUSES,
+}
+
+# Host -> overrides of DEFAULT_POLICY
+ENDPOINT_POLICIES = {
+    # GraphQL reads are idempotent; big items_page responses can take a while.
+    # 429s go back to monday_api.run_query, which tracks the complexity budget
+    "api.monday.com": {"timeout": (5, 60), "retries": 3, "backoff": 2.0,
+                       "retry_statuses": SERVER_ERROR_STATUSES},
+    # Token and vehicle location calls are small and quick
+    "fim.api.us.fleetmatics.com": {"timeout": (5, 20), "retries": 3, "backoff": 1.0},
+    # Completions are billed and not idempotent: only retry when the connection
+    # never opened, and leave 429s to the caller's rate limiter
+    "api.groq.com": {"timeout": (5, 60), "retries": 2, "backoff": 2.0, "pool_size": 16,
+                     "retry_reads": False, "retry_methods": ("GET",)},
+}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def policy_for(url):
+    host = urlsplit(url).hostname or ""
+    return {**DEFAULT_POLICY, **ENDPOINT_POLICIES.get(host, {})}
+
+
+def _adapter(policy):
+    retry = Retry(
+        total=policy["retries"],
+        connect=policy["retries"],
+        read=policy["retries"] if policy["retry_reads"] else 0,
+        status=policy["retries"],
+        backoff_factor=policy["backoff"],
+        status_forcelist=policy["retry_statuses"],
+        allowed_methods=frozenset(policy["retry_methods"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,  # hand the last response back to the caller's status checks
+    )
+    return HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=policy["pool_size"],
+        max_retries=retry,
+    )
+
+
+class PooledSession(requests.Session):
+    """Session that applies the per-host timeout when the caller doesn't pass one."""
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", policy_for(url)["timeout"])
+        return super().request(method, url, **kwargs)
+
+
+def build_session():
+    session = PooledSession()
+    session.headers.update({
+        "Accept-Encoding": "gzip, deflate",
+        "Connection": "keep-alive",
+    })
+
+    session.mount("https://", _adapter(DEFAULT_POLICY))
+    session.mount("http://", _adapter(DEFAULT_POLICY))
+    for host in ENDPOINT_POLICIES:
+        # Longest prefix wins, so these take precedence over the scheme defaults
+        session.mount(f"https://{host}", _adapter(policy_for(f"https://{host}")))
+    return session
+
+
+def get_session():
+    """Process-wide pooled session (created on first use, safe to share across threads)."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session()
+    return _session
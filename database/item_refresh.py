@@ -0,0 +1,135 @@
+"""
+Apply a single Monday webhook event without re-running the full sync.
+
+The event's item is refetched with items(ids: [...]) and merged into the
+board's saved snapshot (main_board_state.json / truck_board_state.json,
+kept in memory between events). api_out.json or truck.json is then rebuilt
+from that snapshot and the change is written to Postgres. Events that
+aren't about one item on a board we already have a snapshot of (group or
+column changes, items moving between boards, first run) are left to the
+full sync.
+"""
+import json
+import os
+import threading
+
+import psycopg2
+
+import delta_sync
+import Main_Data
+import records
+import Team_Data
+import sync_jobs_data
+from monday_api import column_values_selection
+
+DB_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Item events whose effect spans two boards; simpler to resync everything
+CROSS_BOARD_EVENTS = {"move_pulse_into_board", "move_pulse_from_board"}
+
+_lock = threading.Lock()
+_states = {}  # path -> (mtime, state); reloaded when a full sync rewrites the file
+
+
+def _path(relative):
+    return os.path.join(DB_DIR, relative)
+
+
+def _load_state(path):
+    mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    cached = _states.get(path)
+    if cached is None or cached[0] != mtime:
+        _states[path] = (mtime, delta_sync.load_state(path))
+    return _states[path][1]
+
+
+def _save_state(path, state):
+    delta_sync.save_state(path, state)
+    _states[path] = (os.path.getmtime(path), state)
+
+
+def parse_event(payload):
+    """Pull boardId, pulseId, columnId and value out of a Monday webhook payload."""
+    event = payload.get("event") or {}
+    return {
+        "type": event.get("type"),
+        "board_id": str(event.get("boardId") or ""),
+        "item_id": str(event.get("pulseId") or "") or None,
+        "column_id": event.get("columnId"),
+        "value": event.get("value")
+    }
+
+
+def refresh_item(event):
+    """
+    Apply one parsed webhook event. Returns True when it was handled (or
+    doesn't affect anything we store), False when a full sync is needed.
+    """
+    board_id = event["board_id"]
+    if board_id == str(Main_Data.BOARD_ID):
+        state_path, mapping = _path(Main_Data.STATE_PATH), Main_Data.COLUMN_MAPPING
+        columns = column_values_selection(list(Main_Data.COLUMN_MAPPING), Main_Data.COLUMN_TYPES)
+    elif board_id in Team_Data.TRUCK_BOARDS.values():
+        state_path, mapping = _path(Team_Data.STATE_PATH), Team_Data.TRUCK_COLUMN_MAPPING
+        columns = column_values_selection(list(Team_Data.TRUCK_COLUMN_MAPPING))
+    else:
+        print(f"ℹ️ Ignoring event for untracked board {board_id}")
+        return True
+
+    if not event["item_id"] or event["type"] in CROSS_BOARD_EVENTS:
+        return False
+    if event["type"] == "update_column_value" and event["column_id"] not in mapping:
+        print(f"ℹ️ Column {event['column_id']} isn't synced, nothing to refresh")
+        return True
+
+    with _lock:
+        state = _load_state(state_path)
+        board_state = state["boards"].get(board_id)
+        if not board_state or "items" not in board_state or "groups" not in board_state:
+            return False  # no snapshot to patch yet
+
+        item_id = event["item_id"]
+        fetched = delta_sync.fetch_items([item_id], columns, Main_Data.MONDAY_API_TOKEN)
+        removed = delta_sync.apply_changes(board_state, board_id, [item_id], fetched)
+        _save_state(state_path, state)
+
+        if board_id == str(Main_Data.BOARD_ID):
+            _update_jobs(board_state, board_state["items"].get(item_id), removed)
+        else:
+            _update_trucks(state)
+
+    print(f"🔁 Item {item_id} on board {board_id} {'removed' if removed else 'refreshed'} ({event['type']})")
+    return True
+
+
+def _update_jobs(board_state, item, removed):
+    group_to_category = Main_Data.map_groups_to_categories(board_state["groups"])
+    categories = Main_Data.categorize_items(board_state["items"].values(), group_to_category)
+    with open(_path(Main_Data.API_OUT_PATH), "w") as f:
+        json.dump(categories, f, indent=2)
+
+    current = {row["Name"] for rows in categories.values() for row in rows}
+    # A name can be reused by another item that is still on the board
+    deleted = [old["name"] for old in removed if old["name"] not in current]
+    try:
+        with psycopg2.connect(**sync_jobs_data.DB_PARAMS) as conn, sync_jobs_data.DimensionCache() as dims:
+            with conn.cursor() as cur:
+                if item and group_to_category.get(item["group"]["id"]):
+                    sync_jobs_data.upsert_job(cur, records.job_record(Main_Data.job_row(item)), dims)
+                if deleted:
+                    sync_jobs_data.delete_jobs(cur, deleted)
+            conn.commit()
+    except psycopg2.Error as e:
+        # The JSON snapshot is current; the next full sync will catch the database up
+        print(f"❌ Database update failed: {e}")
+
+
+def _update_trucks(state):
+    full_output = Team_Data.build_truck_output(Team_Data.boards_from_state(state), verbose=False)
+    with open(_path(Team_Data.TRUCK_JSON_PATH), "w") as f:
+        json.dump(full_output, f, indent=2)
+
+    try:
+        sync_jobs_data.sync_job_assignments(full_output)
+    except psycopg2.Error as e:
+        print(f"❌ Database update failed: {e}")
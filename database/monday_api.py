@@ -0,0 +1,235 @@
+"""
+Monday GraphQL calls that stay inside the account's complexity budget.
+
+Every query asks for Monday's complexity block; the answer updates one
+process-wide ComplexityBudget. Before a query is sent its estimated cost is
+reserved against what's left, and if it doesn't fit we sleep exactly until
+the budget resets instead of tripping "Complexity budget exhausted".
+items_page limits are sized from the measured cost per item so each page
+is as large as the remaining budget allows.
+"""
+import json
+import re
+import threading
+import time
+
+from http_client import get_session
+
+MONDAY_API_URL = "https://api.monday.com/v2"
+
+# Add to the top level of any query run through run_query()
+COMPLEXITY_FIELDS = "complexity { before after reset_in_x_seconds }"
+
+MIN_PAGE_LIMIT = 25
+MAX_PAGE_LIMIT = 500  # Monday's items_page maximum
+BUDGET_RESERVE = 1000  # keep a little headroom for groups/columns lookups
+MAX_BUDGET_RETRIES = 3
+BUDGET_WINDOW_SECONDS = 60  # Monday refills the complexity budget every minute
+
+# Typed fragments, keyed by Monday column type, added only when a requested column has that type
+VALUE_FRAGMENTS = {
+    "board_relation": "... on BoardRelationValue { linked_item_ids linked_items { id name } }",
+    "mirror": "... on MirrorValue { display_value }",
+    "location": "... on LocationValue { lat lng address }",
+}
+
+_RESET_PATTERN = re.compile(r"reset in (\d+) seconds?", re.IGNORECASE)
+
+
+class ComplexityBudgetExhausted(Exception):
+    """
+    Raised instead of sleeping when a non-blocking call doesn't fit in the budget.
+    from_server is True when Monday rejected the request, False when the local
+    budget turned it away before anything was sent.
+    """
+
+    def __init__(self, reset_in_seconds, from_server=False):
+        super().__init__(f"Complexity budget exhausted, reset in {reset_in_seconds:.0f} seconds")
+        self.reset_in_seconds = reset_in_seconds
+        self.from_server = from_server
+
+
+class ComplexityBudget:
+    """What's left of the complexity budget and when it resets, shared across threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.total = None  # full budget, learned from the largest "before" seen
+        self.remaining = None  # unknown until the first response
+        self.reset_at = 0.0
+
+    def update(self, complexity):
+        """Record the complexity block of a response."""
+        with self._lock:
+            self.total = max(self.total or 0, complexity["before"])
+            self.remaining = complexity["after"]
+            self.reset_at = time.monotonic() + complexity["reset_in_x_seconds"]
+
+    def exhausted(self, reset_in_seconds):
+        """Record an exhausted-budget error that told us when the reset is."""
+        with self._lock:
+            self.remaining = 0
+            self.reset_at = time.monotonic() + reset_in_seconds
+
+    def _refresh(self, now):
+        # Caller holds the lock. Refill once per window, and move the reset
+        # forward so reservations made after the refill count against it.
+        if self.remaining is not None and now >= self.reset_at:
+            self.remaining = self.total
+            windows = int((now - self.reset_at) // BUDGET_WINDOW_SECONDS) + 1
+            self.reset_at += windows * BUDGET_WINDOW_SECONDS
+
+    def _usable(self):
+        # Caller holds the lock. Most a single call can ever be given, or None if unknown.
+        if self.total is None:
+            return None
+        return max(0, self.total - BUDGET_RESERVE)
+
+    def seconds_until_reset(self):
+        with self._lock:
+            return max(0.0, self.reset_at - time.monotonic())
+
+    def _wait_for_reset(self):
+        wait = self.seconds_until_reset()
+        if wait > 0:
+            print(f"⏳ Complexity budget low, waiting {wait:.1f}s for reset...")
+            time.sleep(wait)
+
+    def reserve(self, cost, block=True):
+        """
+        Block until `cost` fits in the remaining budget, then set it aside.
+        With block=False, raise ComplexityBudgetExhausted instead of waiting.
+        """
+        while True:
+            with self._lock:
+                self._refresh(time.monotonic())
+                # An estimate bigger than a full budget could never fit: wait for a full one instead
+                usable = self._usable()
+                if usable is not None:
+                    cost = min(cost, usable)
+                if self.remaining is None or cost <= self.remaining - BUDGET_RESERVE:
+                    if self.remaining is not None:
+                        self.remaining -= cost
+                    return
+            if not block:
+                raise ComplexityBudgetExhausted(self.seconds_until_reset())
+            self._wait_for_reset()
+
+    def page_limit(self, item_cost, default, block=True):
+        """
+        Largest items_page limit the remaining budget can pay for. If not
+        even MIN_PAGE_LIMIT items fit, wait for the reset and size against
+        the refilled budget instead of crawling along with tiny pages
+        (with block=False, raise ComplexityBudgetExhausted instead).
+        """
+        if not item_cost:
+            return default
+        while True:
+            with self._lock:
+                self._refresh(time.monotonic())
+                remaining = self.remaining
+                full = remaining is not None and remaining >= (self.total or 0)
+            if remaining is None:
+                return MAX_PAGE_LIMIT
+            affordable = int((remaining - BUDGET_RESERVE) // item_cost)
+            if affordable >= MIN_PAGE_LIMIT:
+                return min(MAX_PAGE_LIMIT, affordable)
+            if full:
+                # Even a full budget can't pay for MIN_PAGE_LIMIT items; waiting won't help
+                return max(1, affordable)
+            if not block:
+                raise ComplexityBudgetExhausted(self.seconds_until_reset())
+            self._wait_for_reset()
+
+
+# Shared by every board fetch in the process
+budget = ComplexityBudget()
+
+
+def _budget_reset_wait(data):
+    """Seconds until reset if the response is an exhausted-budget error, else None."""
+    messages = [e.get("message", "") for e in data.get("errors") or []]
+    if data.get("error_message"):
+        messages.append(data["error_message"])
+    for error in data.get("errors") or []:
+        retry_in = (error.get("extensions") or {}).get("retry_in_seconds")
+        if retry_in is not None:
+            return float(retry_in)
+    for message in messages:
+        if "complexity budget exhausted" in message.lower():
+            match = _RESET_PATTERN.search(message)
+            return float(match.group(1)) if match else 60.0
+    return None
+
+
+def _retry_after(response):
+    """Seconds from a 429's Retry-After header, or one budget window."""
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return float(BUDGET_WINDOW_SECONDS)
+
+
+def run_query(query, api_key, label="Monday API", estimated_cost=0, block=True):
+    """
+    POST a query that includes COMPLEXITY_FIELDS and return the parsed JSON.
+    Waits for the budget before sending, and after an exhausted-budget error
+    sleeps until the reset and tries again (up to MAX_BUDGET_RETRIES times).
+    With block=False it raises ComplexityBudgetExhausted instead of waiting,
+    so a worker pool can hand the slot to someone else.
+    """
+    headers = {"Authorization": api_key}
+    for attempt in range(MAX_BUDGET_RETRIES):
+        budget.reserve(estimated_cost, block)
+        response = get_session().post(MONDAY_API_URL, json={"query": query}, headers=headers)
+
+        try:
+            data = response.json()
+        except ValueError:
+            if response.status_code != 429:
+                raise Exception(f"{label} failed: {response.status_code} - {response.text}")
+            data = {}
+
+        complexity = (data.get("data") or {}).get("complexity")
+        if complexity:
+            budget.update(complexity)
+
+        wait = _budget_reset_wait(data)
+        if wait is None and response.status_code == 429:
+            # Rate limited without a complexity error; the session leaves 429s to us
+            wait = _retry_after(response)
+        if wait is not None:
+            budget.exhausted(wait)
+            if not block:
+                raise ComplexityBudgetExhausted(wait, from_server=True)
+            print(f"⚠️ {label}: complexity budget exhausted (attempt {attempt + 1}/{MAX_BUDGET_RETRIES})")
+            continue
+
+        if response.status_code != 200:
+            raise Exception(f"{label} failed: {response.text}")
+        if "errors" in data:
+            raise Exception(f"{label} error: {data['errors'][0]['message']}")
+        return data
+
+    raise Exception(f"{label} error: Complexity budget exhausted after {MAX_BUDGET_RETRIES} attempts")
+
+
+def column_values_selection(column_ids, column_types=None):
+    """
+    column_values selection limited to column_ids, with the typed fragments
+    those columns need. column_types maps column id -> Monday column type;
+    without it every fragment is included.
+    """
+    ids = ", ".join(json.dumps(col_id) for col_id in column_ids)
+    if column_types is None:
+        types = VALUE_FRAGMENTS.keys()
+    else:
+        types = [t for t in VALUE_FRAGMENTS if t in {column_types.get(c) for c in column_ids}]
+    fragments = " ".join(VALUE_FRAGMENTS[t] for t in types)
+    return f"column_values(ids: [{ids}]) {{ id text value {fragments} }}"
+
+
+def query_cost(data):
+    """Complexity points a run_query() response consumed."""
+    complexity = data["data"].get("complexity")
+    return complexity["before"] - complexity["after"] if complexity else 0
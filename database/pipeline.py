@@ -0,0 +1,92 @@
+"""
+In-process pipeline runner.
+
+Stages are plain functions arranged in a dependency graph. A stage starts as
+soon as every stage it depends on has finished, so independent stages run
+concurrently on a thread pool. Each stage is called with its dependencies'
+return values as keyword arguments (named after the stage), which lets data
+pass between stages in memory instead of through JSON files.
+
+A stage that raises is retried up to `attempts` times. If it still fails,
+the stages that depend on it run anyway with None in its place, so they can
+fall back to the last output on disk the way the old script chains did.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+MAX_WORKERS = 4
+
+
+class Stage:
+    def __init__(self, name, func, deps=(), attempts=1, retry_wait=0):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.attempts = attempts
+        self.retry_wait = retry_wait
+
+
+def _run_stage(stage, inputs):
+    """Call the stage, retrying on failure. Returns its report."""
+    report = {"stage": stage.name, "status": "failed", "attempts": 0, "duration_s": 0.0, "result": None, "error": None}
+    started = time.perf_counter()
+    for attempt in range(1, stage.attempts + 1):
+        report["attempts"] = attempt
+        print(f"\n▶️ Running {stage.name}...")
+        try:
+            report["result"] = stage.func(**inputs)
+            report["status"] = "ok"
+            report["error"] = None
+            break
+        except Exception as e:
+            report["error"] = str(e)
+            print(f"❌ Attempt {attempt} failed running {stage.name}: {e}")
+            if attempt < stage.attempts:
+                print(f"⏳ Retrying {stage.name} in {stage.retry_wait} seconds...")
+                time.sleep(stage.retry_wait)
+            else:
+                print(f"🚫 Giving up on {stage.name} after {stage.attempts} attempts.")
+    report["duration_s"] = round(time.perf_counter() - started, 3)
+    if report["status"] == "ok":
+        print(f"✅ {stage.name} completed in {report['duration_s']:.2f}s.")
+    return report
+
+
+def run_pipeline(stages, max_workers=MAX_WORKERS):
+    """
+    Run every stage once its dependencies are done.
+    Returns {stage name: report} with status ("ok"/"failed"), attempts,
+    duration_s, result and error, in the order the stages were given.
+    """
+    by_name = {stage.name: stage for stage in stages}
+    for stage in stages:
+        missing = [dep for dep in stage.deps if dep not in by_name]
+        if missing:
+            raise ValueError(f"Stage {stage.name} depends on unknown stage(s): {', '.join(missing)}")
+
+    reports = {}
+    waiting = list(stages)
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while waiting or running:
+            for stage in [s for s in waiting if all(dep in reports for dep in s.deps)]:
+                waiting.remove(stage)
+                inputs = {dep: reports[dep]["result"] for dep in stage.deps}
+                running[pool.submit(_run_stage, stage, inputs)] = stage.name
+
+            if not running:
+                # Nothing can start and nothing is running: the graph has a cycle
+                raise ValueError(f"Dependency cycle between stages: {', '.join(s.name for s in waiting)}")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                reports[running.pop(future)] = future.result()
+
+    return {stage.name: reports[stage.name] for stage in stages}
+
+
+def print_summary(reports):
+    print("\n⏱️ Stage timings:")
+    for report in reports.values():
+        icon = "✅" if report["status"] == "ok" else "❌"
+        print(f"  {icon} {report['stage']:<28} {report['duration_s']:>8.2f}s  ({report['attempts']} attempt(s))")
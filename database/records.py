@@ -0,0 +1,201 @@
+"""
+Typed records for the JSON the extractors write, and a streaming reader for it.
+
+Main_Data writes api_out.json as {category: [row, ...]} and Team_Data writes
+truck.json as [{vehicle, group, data: [row, ...]}, ...], with the column
+labels from their COLUMN_MAPPINGs and Monday's text values ("" or "N/A" when
+empty). job_record / assignment_records turn those rows into the typed
+values sync_jobs_data writes to Postgres, whether the rows come straight from
+the extractors in memory or are streamed back from the files by iter_json.
+"""
+import json
+from datetime import datetime, timezone
+
+STREAM_CHUNK_SIZE = 64 * 1024
+NUMBER_CHARS = "0123456789.eE+-"
+
+EMPTY_VALUES = ("", "N/A")
+NIGHT_JOB_VALUE = "✅ Yes"
+
+
+def text(value):
+    """Stripped string, or None for Monday's empty placeholders."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    return None if value in EMPTY_VALUES else value
+
+
+def number(value):
+    """Numeric cell as float, 0.0 when empty or not a number."""
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def day(value):
+    """YYYY-MM-DD cell as a date, or None."""
+    try:
+        return datetime.strptime(str(value).strip(), "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+
+
+def utc_timestamp(value):
+    """UpdateUTC-style ISO timestamp as an aware UTC datetime (the API leaves the offset off)."""
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return value  # let Postgres try
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def job_record(row):
+    """One api_out.json row (Main_Data.job_row) as a jobs record."""
+    return {
+        "monday_id": text(row.get("Name")),
+        "name": text(row.get("Name")),
+        "client": text(row.get("Client")),
+        "status": text(row.get("Status")),
+        "material": text(row.get("Material")),
+        "vendor": text(row.get("Material Vendor")),
+        "job_type": text(row.get("Job Type")),
+        "address": text(row.get("Address")),
+        "latitude": number(row.get("Latitude")),
+        "longitude": number(row.get("Longitude")),
+        "bid_qty": number(row.get("Bid Qty")),
+        "is_night_job": row.get("Night?") == NIGHT_JOB_VALUE
+    }
+
+
+def assignment_records(entry):
+    """
+    job_assignments records for one truck.json entry ({vehicle, group, data}).
+    Rows without a linked job or a valid date (e.g. days off) are skipped.
+    """
+    for row in entry.get("data") or []:
+        job_name = text(row.get("Job Name"))
+        job_date = day(row.get("Date"))
+        if not job_name or not job_date:
+            continue
+        yield {
+            "vehicle": entry["vehicle"],
+            "group": entry.get("group"),
+            "job_name": job_name,
+            "date": job_date,
+            "dispatch_status": text(row.get("Dispatch Status")),
+            "load_status": text(row.get("Load Status")),
+            "qty_left": number(row.get("Quantity Left on Truck")),
+            "qty_installed": number(row.get("Quantity Installed"))
+        }
+
+
+def vehicle_status_record(record):
+    """One truck_location.json record as a vehicle_status_history record, or None without a timestamp."""
+    content = (record.get("ContentResource") or {}).get("Value") or {}
+    if not content.get("UpdateUTC"):
+        return None
+    return {
+        "vehicle": record.get("VehicleNumber"),
+        "timestamp": utc_timestamp(content["UpdateUTC"]),
+        "status": content.get("DisplayState"),
+        "address": (content.get("Address") or {}).get("AddressLine1"),
+        "latitude": number(content.get("Latitude")),
+        "longitude": number(content.get("Longitude")),
+        "speed": number(content.get("Speed"))
+    }
+
+
+class _Reader:
+    """Character-level access to a JSON file read in chunks."""
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        chunk = self.f.read(STREAM_CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        # Drop what's been consumed so the buffer stays about one chunk long
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Next non-whitespace character (not consumed), or "" at the end."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf) or not self._fill():
+                return self.buf[self.pos:self.pos + 1]
+
+    def expect(self, chars):
+        c = self.peek()
+        if not c or c not in chars:
+            raise json.JSONDecodeError(f"Expected one of {chars!r}", self.buf, self.pos)
+        self.pos += 1
+        return c
+
+    def value(self):
+        """Decode the next complete JSON value, reading more of the file as needed."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # A number cut off by the end of the buffer ("2." of "2.5") may continue in the next chunk
+                is_number = isinstance(value, (int, float)) and not isinstance(value, bool)
+                if self.eof or not is_number or self.buf[end:].strip(NUMBER_CHARS):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+
+def _walk(reader, depth):
+    if depth == 0:
+        yield reader.value()
+        return
+
+    opener = reader.expect("[{")
+    closer = "]" if opener == "[" else "}"
+    if reader.peek() == closer:
+        reader.pos += 1
+        return
+    while True:
+        if opener == "{":
+            reader.value()  # key
+            reader.expect(":")
+        yield from _walk(reader, depth - 1)
+        if reader.expect("," + closer) == closer:
+            return
+
+
+def iter_json(path, depth=1):
+    """
+    Yield the values `depth` containers deep in a JSON file one at a time,
+    without loading the whole file: depth=1 gives the elements of the
+    top-level array (or values of the top-level object), depth=2 the
+    elements of each of those, and so on.
+    """
+    with open(path, "r") as f:
+        yield from _walk(_Reader(f), depth)
+
+
+def iter_jobs(path):
+    """jobs records streamed from api_out.json."""
+    for row in iter_json(path, depth=2):
+        yield job_record(row)
+
+
+def iter_assignments(path):
+    """job_assignments records streamed from truck.json."""
+    for entry in iter_json(path, depth=1):
+        yield from assignment_records(entry)
@@ -68,17 +68,43 @@ def create_tables():
             name TEXT
         )
         """,
+        # GPS history is partitioned by month so range scans touch only the
+        # months they ask for and old months can be dropped as whole tables
         """
         CREATE TABLE IF NOT EXISTS vehicle_status_history (
-            id SERIAL PRIMARY KEY,
-            vehicle_id INT REFERENCES vehicles(id),
-            timestamp TIMESTAMPTZ,
+            vehicle_id INT NOT NULL REFERENCES vehicles(id),
+            timestamp TIMESTAMPTZ NOT NULL,
             status TEXT,
             address TEXT,
             latitude FLOAT,
             longitude FLOAT,
-            speed FLOAT
-        )
+            speed FLOAT,
+            PRIMARY KEY (vehicle_id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+        """,
+        # Positions arrive in time order, so a BRIN index covers time-range scans cheaply;
+        # per-truck tracks use the (vehicle_id, timestamp) primary key
+        """
+        CREATE INDEX IF NOT EXISTS vehicle_status_history_timestamp_brin
+        ON vehicle_status_history USING BRIN (timestamp)
+        """,
+        """
+        CREATE OR REPLACE FUNCTION ensure_vehicle_status_partitions(from_ts TIMESTAMPTZ, to_ts TIMESTAMPTZ)
+        RETURNS void AS $$
+        DECLARE
+            month_start TIMESTAMP := date_trunc('month', from_ts AT TIME ZONE 'UTC');
+        BEGIN
+            WHILE month_start <= to_ts AT TIME ZONE 'UTC' LOOP
+                EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS %I PARTITION OF vehicle_status_history FOR VALUES FROM (%L) TO (%L)',
+                    'vehicle_status_history_p' || to_char(month_start, 'YYYYMM'),
+                    month_start AT TIME ZONE 'UTC',
+                    (month_start + INTERVAL '1 month') AT TIME ZONE 'UTC'
+                );
+                month_start := month_start + INTERVAL '1 month';
+            END LOOP;
+        END;
+        $$ LANGUAGE plpgsql
         """,
         """
         CREATE TABLE IF NOT EXISTS job_assignments (
@@ -91,15 +117,65 @@ def create_tables():
             qty_left FLOAT,
             qty_installed FLOAT
         )
+        """,
+        # One assignment per job, truck and day, so re-syncs update rows instead
+        # of appending them. Older databases may hold duplicates: keep the newest.
+        """
+        DELETE FROM job_assignments a
+        USING job_assignments b
+        WHERE a.job_id = b.job_id
+          AND a.vehicle_id = b.vehicle_id
+          AND a.date = b.date
+          AND a.id < b.id
+        """,
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS job_assignments_job_vehicle_date_key
+        ON job_assignments (job_id, vehicle_id, date)
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS job_assignments_vehicle_date_idx
+        ON job_assignments (vehicle_id, date)
         """
     ]
 
     with psycopg2.connect(**DB_PARAMS) as conn:
         with conn.cursor() as cur:
+            # Databases created before partitioning have a plain vehicle_status_history table
+            cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('vehicle_status_history')")
+            row = cur.fetchone()
+            legacy = row is not None and row[0] == 'r'
+            if legacy:
+                cur.execute("ALTER TABLE vehicle_status_history RENAME TO vehicle_status_history_unpartitioned")
+                cur.execute("ALTER INDEX IF EXISTS vehicle_status_history_pkey RENAME TO vehicle_status_history_unpartitioned_pkey")
+
             for command in commands:
                 cur.execute(command)
+
+            if legacy:
+                migrate_vehicle_status_history(cur)
         conn.commit()
         print("✅ Database schema created successfully.")
 
+def migrate_vehicle_status_history(cur):
+    """Copy the old unpartitioned history into the partitioned table (one row per vehicle and timestamp) and drop it."""
+    cur.execute("""
+        SELECT ensure_vehicle_status_partitions(min(timestamp), max(timestamp))
+        FROM vehicle_status_history_unpartitioned
+        HAVING count(timestamp) > 0
+    """)
+    cur.execute("""
+        INSERT INTO vehicle_status_history (
+            vehicle_id, timestamp, status, address, latitude, longitude, speed
+        )
+        SELECT DISTINCT ON (vehicle_id, timestamp)
+            vehicle_id, timestamp, status, address, latitude, longitude, speed
+        FROM vehicle_status_history_unpartitioned
+        WHERE vehicle_id IS NOT NULL AND timestamp IS NOT NULL
+        ORDER BY vehicle_id, timestamp, id DESC
+        ON CONFLICT (vehicle_id, timestamp) DO NOTHING
+    """)
+    print(f"📦 Moved {cur.rowcount} vehicle positions into the partitioned history table.")
+    cur.execute("DROP TABLE vehicle_status_history_unpartitioned")
+
 if __name__ == "__main__":
     create_tables()
@@ -1,59 +1,71 @@
-import subprocess
 import os
+import sys
 from datetime import datetime
-import time
-# List of data extraction scripts
-DATA_SCRIPTS = [
-    "Main_Data.py",
-    "Team_Data.py",
-    "truck_location.py"
-]
+from functools import partial
 
-# Path to the sync script
-SYNC_SCRIPT = "sync_jobs_data.py"
+import pipeline
+import Main_Data
+import Team_Data
+import truck_location
+import sync_jobs_data
 
+# Retry policy for each stage (a failed stage is rerun in-process)
 MAX_RETRIES = 3
 WAIT_SECONDS = 20
 
-def run_script(script):
-    print(f"\n▶️ Running {script}...")
-    for attempt in range(MAX_RETRIES):
-        print("Running script: ", script)
-        #print current directory
-        print("Current directory: ", os.getcwd())
-        result = subprocess.run(["python", script], capture_output=True, text=True)
-        print("Result: ", result)
-        if result.returncode == 0:
-            print(f"✅ {script} completed successfully.")
-            print(result.stdout)
-            return
-        else:
-            print(f"❌ Attempt {attempt + 1} failed running {script}:")
-            print(result.stderr)
-            if attempt < MAX_RETRIES - 1:
-                print(f"⏳ Retrying {script} in {WAIT_SECONDS} seconds...")
-                time.sleep(WAIT_SECONDS)
-            else:
-                print(f"🚫 Giving up on {script} after {MAX_RETRIES} attempts.")
+# Stages that share a worker pool; the three extractors are independent
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", 3))
+
+
+def sync_jobs(main_data):
+    # main_data is None if the extractor failed; then fall back to api_out.json
+    sync_jobs_data.sync_jobs(main_data)
+    sync_jobs_data.remove_deleted_jobs()
+
+
+def sync_job_assignments(team_data, sync_jobs, dims):
+    # Assignments look jobs up by name, so they wait for the jobs sync.
+    # team_data is None if the extractor failed; then fall back to truck.json
+    sync_jobs_data.sync_job_assignments(team_data, dims=dims)
+
+
+def sync_vehicle_status_history(truck_location, dims):
+    sync_jobs_data.sync_vehicle_status_history(truck_location, dims=dims)
+
+
+def build_stages(dims):
+    """dims: the DimensionCache the database stages share for this run."""
+    retry = {"attempts": MAX_RETRIES, "retry_wait": WAIT_SECONDS}
+    return [
+        pipeline.Stage("main_data", Main_Data.run, **retry),
+        pipeline.Stage("team_data", Team_Data.run, **retry),
+        pipeline.Stage("truck_location", truck_location.run, **retry),
+        pipeline.Stage("sync_jobs", sync_jobs, deps=["main_data"], **retry),
+        pipeline.Stage("sync_job_assignments", partial(sync_job_assignments, dims=dims),
+                       deps=["team_data", "sync_jobs"], **retry),
+        pipeline.Stage("sync_vehicle_status_history", partial(sync_vehicle_status_history, dims=dims),
+                       deps=["truck_location"], **retry),
+    ]
 
 
 def main():
     print("\n🚀 Starting full data refresh process...")
 
-    for script in DATA_SCRIPTS:
-        if os.path.exists(script):
-            run_script(script)
-        else:
-            print(f"⚠️ Script not found: {script}")
+    with sync_jobs_data.DimensionCache() as dims:
+        reports = pipeline.run_pipeline(build_stages(dims), max_workers=PIPELINE_WORKERS)
+    pipeline.print_summary(reports)
 
-    if os.path.exists(SYNC_SCRIPT):
-        run_script(SYNC_SCRIPT)
+    failed = [name for name, report in reports.items() if report["status"] != "ok"]
+    if failed:
+        print(f"\n⚠️ Finished with failed stages: {', '.join(failed)}")
     else:
-        print(f"⚠️ Sync script not found: {SYNC_SCRIPT}")
-
-    print("\n✅ All data updated and synced to the database.")
-    print(f"✅ Webhook received at {datetime.now()}")
+        print("\n✅ All data updated and synced to the database.")
+    print(f"✅ Sync finished at {datetime.now()}")
+    return reports
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    reports = main()
+    # Non-zero exit so callers (the webhook queue, cron) can tell a partial sync from a clean one
+    if any(report["status"] != "ok" for report in reports.values()):
+        sys.exit(1)
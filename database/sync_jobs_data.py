@@ -1,7 +1,12 @@
+import csv
+import io
 import json
 import os
+import threading
+from datetime import date
 import psycopg2
-from datetime import datetime
+from psycopg2.extras import execute_values
+import records
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -17,203 +22,435 @@ DB_PARAMS = {
 DATA_PATH = "json/api_out.json"
 TRUCK_PATH = "json/truck.json"
 TRUCK_LOC_PATH = "json/truck_location.json"
-
-def get_or_create(cur, table, column, value):
-    if not value:
-        return None
-    cur.execute(f"SELECT id FROM {table} WHERE {column} = %s", (value,))
-    row = cur.fetchone()
-    if row:
-        return row[0]
-    cur.execute(f"INSERT INTO {table} ({column}) VALUES (%s) RETURNING id", (value,))
-    return cur.fetchone()[0]
-
-def extract_json_from_mixed_file(path):
-    from collections import defaultdict
-
-    with open(path, 'r') as file:
-        lines = file.readlines()
-
-    section = None
-    data = defaultdict(list)
-    current_headers = []
-    capture = False
-
-    for line in lines:
-        line = line.strip()
-        if line.endswith("Jobs:"):
-            section = line.replace("Jobs:", "").strip()
-            current_headers = []
-            capture = False
-
-        elif line.startswith("+--") and not current_headers:
-            capture = True
-
-        elif capture and line.startswith("|"):
-            if not current_headers:
-                current_headers = [col.strip() for col in line.strip('|').split('|')]
-            else:
-                values = [v.strip() for v in line.strip('|').split('|')]
-                if len(values) == len(current_headers):
-                    row = dict(zip(current_headers, values))
-                    data[section].append(row)
-
-        elif line.startswith("🚫") or line.startswith("📦") or line.startswith("+--"):
-            continue
-
-    return data
-
-def sync_jobs():
-    data = extract_json_from_mixed_file(DATA_PATH)
-
+DELETED_JOBS_PATH = "json/deleted_jobs.json"  # queued by Main_Data's incremental sync
+
+# Full syncs COPY every job into a staging table and merge it in one statement;
+# upsert_job is kept for single-item webhook refreshes
+JOB_COLUMNS = [
+    "monday_id", "name", "client", "status", "material", "vendor", "job_type",
+    "address", "latitude", "longitude", "bid_qty", "is_night_job"
+]
+ASSIGNMENT_BATCH_SIZE = 1000  # assignment rows per execute_values upsert
+
+VEHICLE_STATUS_COLUMNS = ["vehicle_id", "timestamp", "status", "address", "latitude", "longitude", "speed"]
+# Months of GPS history to keep; older month partitions are dropped (0 keeps everything)
+VEHICLE_HISTORY_RETENTION_MONTHS = int(os.getenv("VEHICLE_HISTORY_RETENTION_MONTHS", 0))
+
+# (dimension table, jobs foreign key, job record field)
+JOB_DIMENSIONS = [
+    ("clients", "client_id", "client"),
+    ("job_statuses", "status_id", "status"),
+    ("materials", "material_id", "material"),
+    ("material_vendors", "vendor_id", "vendor"),
+    ("job_types", "job_type_id", "job_type")
+]
+
+class DimensionCache:
+    """
+    name -> id for the lookup tables (clients, materials, vehicles, ...),
+    shared by the sync functions of one run. Each table is read in one query
+    the first time it's needed and names it doesn't have yet are inserted in
+    one batch. The cache uses its own autocommit connection, so the ids it
+    hands out are committed and safe to use from any sync's transaction or
+    thread.
+    """
+
+    def __init__(self, db_params=None):
+        self.db_params = db_params or DB_PARAMS
+        self.conn = None
+        self.ids = {}  # (table, column) -> {name: id}
+        self.lock = threading.Lock()
+
+    def _cursor(self):
+        if self.conn is None or self.conn.closed:
+            self.conn = psycopg2.connect(**self.db_params)
+            self.conn.autocommit = True
+        return self.conn.cursor()
+
+    def resolve(self, table, column, names):
+        """{name: id} for the non-empty names, inserting any the table doesn't have."""
+        names = {name for name in names if name}
+        key = (table, column)
+        with self.lock:
+            known = self.ids.get(key)
+            if known is None or not names <= known.keys():
+                with self._cursor() as cur:
+                    if known is None:
+                        cur.execute(f"SELECT {column}, id FROM {table}")
+                        known = self.ids[key] = dict(cur.fetchall())
+                    missing = sorted(names - known.keys())
+                    if missing:
+                        # The no-op DO UPDATE makes RETURNING include names someone else just added
+                        cur.execute(f"""
+                            INSERT INTO {table} ({column})
+                            SELECT unnest(%s::text[])
+                            ON CONFLICT ({column}) DO UPDATE SET {column} = EXCLUDED.{column}
+                            RETURNING {column}, id
+                        """, (missing,))
+                        known.update(cur.fetchall())
+            return {name: known[name] for name in names}
+
+    def get(self, table, column, name):
+        if not name:
+            return None
+        return self.resolve(table, column, [name])[name]
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def upsert_job(cur, job, dims):
+    """Insert or update one jobs record (records.job_record), keyed by monday_id (the item name)."""
+    client_id = dims.get('clients', 'name', job["client"])
+    material_id = dims.get('materials', 'name', job["material"])
+    vendor_id = dims.get('material_vendors', 'name', job["vendor"])
+    job_type_id = dims.get('job_types', 'name', job["job_type"])
+    status_id = dims.get('job_statuses', 'name', job["status"])
+
+    cur.execute("""
+        INSERT INTO jobs (
+            monday_id, name, client_id, status_id, material_id, vendor_id,
+            job_type_id, address, latitude, longitude, bid_qty, is_night_job
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (monday_id) DO UPDATE SET
+            name = EXCLUDED.name,
+            client_id = EXCLUDED.client_id,
+            status_id = EXCLUDED.status_id,
+            material_id = EXCLUDED.material_id,
+            vendor_id = EXCLUDED.vendor_id,
+            job_type_id = EXCLUDED.job_type_id,
+            address = EXCLUDED.address,
+            latitude = EXCLUDED.latitude,
+            longitude = EXCLUDED.longitude,
+            bid_qty = EXCLUDED.bid_qty,
+            is_night_job = EXCLUDED.is_night_job
+    """, (
+        job["monday_id"],
+        job["name"],
+        client_id,
+        status_id,
+        material_id,
+        vendor_id,
+        job_type_id,
+        job["address"],
+        job["latitude"],
+        job["longitude"],
+        job["bid_qty"],
+        job["is_night_job"]
+    ))
+
+class CsvStream:
+    """
+    Read-only file object that renders rows as CSV on demand, so COPY never needs them all in memory.
+    An exception from the rows (e.g. a malformed JSON file being streamed) is kept in `error`.
+    """
+
+    def __init__(self, rows):
+        self.rows = iter(rows)
+        self.buf = ""
+        self.out = io.StringIO()
+        self.writer = csv.writer(self.out, lineterminator="\n")
+        self.error = None
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buf) < size:
+            try:
+                row = next(self.rows, None)
+            except Exception as e:
+                self.error = e
+                raise
+            if row is None:
+                break
+            self.writer.writerow(row)
+            self.buf += self.out.getvalue()
+            self.out.seek(0)
+            self.out.truncate()
+        if size < 0:
+            size = len(self.buf)
+        chunk, self.buf = self.buf[:size], self.buf[size:]
+        return chunk
+
+def copy_rows(cur, table, columns, rows):
+    """
+    COPY rows (sequences in `columns` order, None for NULL) into table.
+    If producing the rows fails, that exception is raised rather than psycopg2's.
+    """
+    stream = CsvStream(rows)
+    try:
+        cur.copy_expert(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+            stream
+        )
+    except psycopg2.Error:
+        # psycopg2 aborts the COPY when read() raises and only keeps the message
+        if stream.error is not None:
+            raise stream.error
+        raise
+
+def bulk_upsert_jobs(cur, jobs):
+    """
+    Upsert jobs records set-wise: COPY them into a temporary staging table,
+    add any new dimension names, then merge into jobs with one
+    INSERT ... SELECT ... ON CONFLICT. The number of statements doesn't
+    depend on the number of jobs. Returns the number of jobs written.
+    """
+    cur.execute("""
+        CREATE TEMP TABLE staging_jobs (
+            seq INT,
+            monday_id TEXT,
+            name TEXT,
+            client TEXT,
+            status TEXT,
+            material TEXT,
+            vendor TEXT,
+            job_type TEXT,
+            address TEXT,
+            latitude FLOAT,
+            longitude FLOAT,
+            bid_qty FLOAT,
+            is_night_job BOOLEAN
+        ) ON COMMIT DROP
+    """)
+    copy_rows(
+        cur, "staging_jobs", ["seq"] + JOB_COLUMNS,
+        ([seq] + [job[column] for column in JOB_COLUMNS] for seq, job in enumerate(jobs))
+    )
+
+    cur.execute(";".join(f"""
+        INSERT INTO {table} (name)
+        SELECT DISTINCT {field} FROM staging_jobs WHERE {field} IS NOT NULL
+        ON CONFLICT (name) DO NOTHING
+    """ for table, _, field in JOB_DIMENSIONS))
+
+    joins = "\n        ".join(
+        f"LEFT JOIN {table} d{i} ON d{i}.name = s.{field}"
+        for i, (table, _, field) in enumerate(JOB_DIMENSIONS)
+    )
+    # DISTINCT ON keeps the last row per monday_id, as one-by-one upserts would
+    cur.execute(f"""
+        INSERT INTO jobs (
+            monday_id, name, {", ".join(key for _, key, _ in JOB_DIMENSIONS)},
+            address, latitude, longitude, bid_qty, is_night_job
+        )
+        SELECT DISTINCT ON (s.monday_id)
+            s.monday_id, s.name, {", ".join(f"d{i}.id" for i in range(len(JOB_DIMENSIONS)))},
+            s.address, s.latitude, s.longitude, s.bid_qty, s.is_night_job
+        FROM staging_jobs s
+        {joins}
+        WHERE s.monday_id IS NOT NULL
+        ORDER BY s.monday_id, s.seq DESC
+        ON CONFLICT (monday_id) DO UPDATE SET
+            name = EXCLUDED.name,
+            client_id = EXCLUDED.client_id,
+            status_id = EXCLUDED.status_id,
+            material_id = EXCLUDED.material_id,
+            vendor_id = EXCLUDED.vendor_id,
+            job_type_id = EXCLUDED.job_type_id,
+            address = EXCLUDED.address,
+            latitude = EXCLUDED.latitude,
+            longitude = EXCLUDED.longitude,
+            bid_qty = EXCLUDED.bid_qty,
+            is_night_job = EXCLUDED.is_night_job
+    """)
+    return cur.rowcount
+
+def job_records(data=None):
+    """jobs records from Main_Data's categorized output, or streamed from api_out.json when not given."""
+    if data is None:
+        return records.iter_jobs(DATA_PATH)
+    return (records.job_record(row) for rows in data.values() if isinstance(rows, list) for row in rows)
+
+def sync_jobs(data=None):
     with psycopg2.connect(**DB_PARAMS) as conn:
         with conn.cursor() as cur:
-            for category, jobs in data.items():
-                if not isinstance(jobs, list):
-                    continue
-
-                for job in jobs:
-                    client_id = get_or_create(cur, 'clients', 'name', job.get("Client"))
-                    material_id = get_or_create(cur, 'materials', 'name', job.get("Material"))
-                    vendor_id = get_or_create(cur, 'material_vendors', 'name', job.get("Material Vendor"))
-                    job_type_id = get_or_create(cur, 'job_types', 'name', job.get("Job Type"))
-                    status_id = get_or_create(cur, 'job_statuses', 'name', job.get("Status"))
-
-                    cur.execute("""
-                        INSERT INTO jobs (
-                            monday_id, name, client_id, status_id, material_id, vendor_id,
-                            job_type_id, address, latitude, longitude, bid_qty, is_night_job
-                        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        ON CONFLICT (monday_id) DO UPDATE SET
-                            name = EXCLUDED.name,
-                            client_id = EXCLUDED.client_id,
-                            status_id = EXCLUDED.status_id,
-                            material_id = EXCLUDED.material_id,
-                            vendor_id = EXCLUDED.vendor_id,
-                            job_type_id = EXCLUDED.job_type_id,
-                            address = EXCLUDED.address,
-                            latitude = EXCLUDED.latitude,
-                            longitude = EXCLUDED.longitude,
-                            bid_qty = EXCLUDED.bid_qty,
-                            is_night_job = EXCLUDED.is_night_job
-                    """, (
-                        job.get("Name"),
-                        job.get("Name"),
-                        client_id,
-                        status_id,
-                        material_id,
-                        vendor_id,
-                        job_type_id,
-                        job.get("Address"),
-                        float(job.get("Latitude") or 0),
-                        float(job.get("Longitude") or 0),
-                        float(job.get("Bid Qty") or 0),
-                        job.get("Night?") == "✅ Yes"
-                    ))
+            count = bulk_upsert_jobs(cur, job_records(data))
         conn.commit()
-        print("✅ Jobs synced successfully.")
+        print(f"✅ {count} jobs synced successfully.")
+
+def delete_jobs(cur, names):
+    """Delete jobs (and their assignments) by monday_id. Returns the number of jobs deleted."""
+    cur.execute("""
+        DELETE FROM job_assignments
+        WHERE job_id IN (SELECT id FROM jobs WHERE monday_id = ANY(%s))
+    """, (names,))
+    cur.execute("DELETE FROM jobs WHERE monday_id = ANY(%s)", (names,))
+    return cur.rowcount
+
+def remove_deleted_jobs():
+    """Delete jobs that an incremental Main_Data sync saw removed from Monday."""
+    if not os.path.exists(DELETED_JOBS_PATH):
+        return
+    with open(DELETED_JOBS_PATH, 'r') as f:
+        names = json.load(f)
+    if not names:
+        return
 
-def sync_job_assignments():
-    with open(TRUCK_PATH, 'r') as f:
-        lines = f.readlines()
+    # A name can be reused by another item that is still on the board
+    current = {job["monday_id"] for job in records.iter_jobs(DATA_PATH)}
+    names = [name for name in names if name not in current]
 
     with psycopg2.connect(**DB_PARAMS) as conn:
         with conn.cursor() as cur:
-            vehicle_code = None
-            for line in lines:
-                line = line.strip()
-
-                if line.startswith("==") and "(" in line and ")" in line:
-                    parts = line.split("(")
-                    vehicle_code = parts[0].strip("= 🛻").strip()
-                    vehicle_id = get_or_create(cur, 'vehicles', 'code', vehicle_code)
-
-                elif line.startswith("|") and vehicle_code:
-                    parts = [p.strip() for p in line.strip('|').split('|')]
-                    if len(parts) < 16:
-                        continue
-
-                    job_name = parts[8]
-                    dispatch_status = parts[3]
-                    load_status = parts[4]
-                    date_str = parts[2]
-                    qty_left = parts[5]
-                    qty_installed = parts[6]
-
-                    cur.execute("SELECT id FROM jobs WHERE name = %s", (job_name,))
-                    job_row = cur.fetchone()
-                    if not job_row:
-                        continue
-
-                    job_id = job_row[0]
-
-                    try:
-                        job_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-                    except:
-                        continue
-
-                    cur.execute("""
-                        INSERT INTO job_assignments (
-                            job_id, vehicle_id, date, dispatch_status, load_status, qty_left, qty_installed
-                        ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-                        ON CONFLICT DO NOTHING
-                    """, (
-                        job_id, vehicle_id, job_date, dispatch_status, load_status,
-                        float(qty_left or 0), float(qty_installed or 0)
-                    ))
+            deleted = delete_jobs(cur, names)
         conn.commit()
-        print("✅ Job assignments synced successfully.")
 
+    with open(DELETED_JOBS_PATH, 'w') as f:
+        json.dump([], f)
+    print(f"✅ Removed {deleted} deleted jobs.")
+
+def load_job_ids(cur):
+    """name -> jobs.id for every job, read in one query."""
+    cur.execute("SELECT name, id FROM jobs WHERE name IS NOT NULL")
+    return dict(cur.fetchall())
+
+def upsert_assignments(cur, rows):
+    """
+    Upsert (job_id, vehicle_id, date, dispatch_status, load_status, qty_left,
+    qty_installed) rows on the (job, vehicle, date) key in one statement.
+    A key repeated within the batch keeps its last row.
+    """
+    rows = list({row[:3]: row for row in rows}.values())
+    execute_values(cur, """
+        INSERT INTO job_assignments (
+            job_id, vehicle_id, date, dispatch_status, load_status, qty_left, qty_installed
+        ) VALUES %s
+        ON CONFLICT (job_id, vehicle_id, date) DO UPDATE SET
+            dispatch_status = EXCLUDED.dispatch_status,
+            load_status = EXCLUDED.load_status,
+            qty_left = EXCLUDED.qty_left,
+            qty_installed = EXCLUDED.qty_installed
+    """, rows, page_size=len(rows) or 1)
+    return len(rows)
+
+def sync_job_assignments(entries=None, path=TRUCK_PATH, dims=None):
+    """Record job assignments from Team_Data's truck.json entries, or streamed from `path` when not given."""
+    if dims is None:
+        with DimensionCache() as dims:
+            return sync_job_assignments(entries, path, dims)
+
+    if entries is None:
+        assignments = records.iter_assignments(path)
+    else:
+        assignments = (a for entry in entries for a in records.assignment_records(entry))
+
+    count = 0
+    with psycopg2.connect(**DB_PARAMS) as conn:
+        with conn.cursor() as cur:
+            job_ids = load_job_ids(cur)
+            batch = []
+            for assignment in assignments:
+                job_id = job_ids.get(assignment["job_name"])
+                if not job_id:
+                    continue
 
-def sync_vehicle_status_history():
-    if os.stat(TRUCK_LOC_PATH).st_size == 0:
-        print("⚠️ truck_location.json is empty. Skipping vehicle status sync.")
+                batch.append((
+                    job_id, dims.get('vehicles', 'code', assignment["vehicle"]), assignment["date"],
+                    assignment["dispatch_status"], assignment["load_status"],
+                    assignment["qty_left"], assignment["qty_installed"]
+                ))
+                if len(batch) >= ASSIGNMENT_BATCH_SIZE:
+                    count += upsert_assignments(cur, batch)
+                    batch = []
+            if batch:
+                count += upsert_assignments(cur, batch)
+        conn.commit()
+        print(f"✅ {count} job assignments synced successfully.")
+
+
+def vehicle_status_rows(data, dims):
+    for record in data:
+        status = records.vehicle_status_record(record)
+        if status:
+            yield [dims.get('vehicles', 'code', status["vehicle"])] + [status[column] for column in VEHICLE_STATUS_COLUMNS[1:]]
+
+def bulk_insert_vehicle_status(cur, rows):
+    """
+    COPY positions into a staging table, create any month partitions they
+    need, then merge the ones not already recorded (one per vehicle and
+    timestamp). Returns the number of new positions.
+    """
+    cur.execute("""
+        CREATE TEMP TABLE staging_vehicle_status (
+            vehicle_id INT,
+            timestamp TIMESTAMPTZ,
+            status TEXT,
+            address TEXT,
+            latitude FLOAT,
+            longitude FLOAT,
+            speed FLOAT
+        ) ON COMMIT DROP
+    """)
+    copy_rows(cur, "staging_vehicle_status", VEHICLE_STATUS_COLUMNS, rows)
+    cur.execute("""
+        SELECT ensure_vehicle_status_partitions(min(timestamp), max(timestamp))
+        FROM staging_vehicle_status
+        HAVING count(*) > 0
+    """)
+    cur.execute(f"""
+        INSERT INTO vehicle_status_history ({", ".join(VEHICLE_STATUS_COLUMNS)})
+        SELECT DISTINCT ON (vehicle_id, timestamp) {", ".join(VEHICLE_STATUS_COLUMNS)}
+        FROM staging_vehicle_status
+        WHERE vehicle_id IS NOT NULL
+        ORDER BY vehicle_id, timestamp
+        ON CONFLICT (vehicle_id, timestamp) DO NOTHING
+    """)
+    return cur.rowcount
+
+def drop_expired_vehicle_status_partitions(cur, months=VEHICLE_HISTORY_RETENTION_MONTHS):
+    """Drop whole month partitions older than `months` months (0 keeps everything)."""
+    if months <= 0:
         return
+    today = date.today()
+    year, month = divmod(today.year * 12 + today.month - 1 - months, 12)
+    cutoff = f"vehicle_status_history_p{year:04d}{month + 1:02d}"
+    cur.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'vehicle_status_history'::regclass
+    """)
+    # Partition names end in YYYYMM, so they sort by month
+    for (name,) in cur.fetchall():
+        if name < cutoff:
+            cur.execute(f'DROP TABLE "{name}"')
+            print(f"🗑️ Dropped expired partition {name}")
+
+def sync_vehicle_status_history(data=None, dims=None):
+    """Record vehicle positions from truck_location's records, or streamed from truck_location.json when not given."""
+    if dims is None:
+        with DimensionCache() as dims:
+            return sync_vehicle_status_history(data, dims)
+
+    if data is None:
+        if os.stat(TRUCK_LOC_PATH).st_size == 0:
+            print("⚠️ truck_location.json is empty. Skipping vehicle status sync.")
+            return
+        data = records.iter_json(TRUCK_LOC_PATH)
 
     try:
-        with open(TRUCK_LOC_PATH, 'r') as f:
-            data = json.load(f)
+        with psycopg2.connect(**DB_PARAMS) as conn:
+            with conn.cursor() as cur:
+                count = bulk_insert_vehicle_status(cur, vehicle_status_rows(data, dims))
+                drop_expired_vehicle_status_partitions(cur)
+            conn.commit()
     except json.JSONDecodeError:
+        # Nothing from a half-read file is committed
         print("❌ truck_location.json is not valid JSON. Skipping vehicle status sync.")
         return
-
-    with psycopg2.connect(**DB_PARAMS) as conn:
-        with conn.cursor() as cur:
-            for record in data:
-                vehicle_code = record.get("VehicleNumber")
-                vehicle_id = get_or_create(cur, 'vehicles', 'code', vehicle_code)
-
-                content = record.get("ContentResource", {}).get("Value", {})
-                timestamp = content.get("UpdateUTC")
-                address = content.get("Address", {}).get("AddressLine1")
-                latitude = content.get("Latitude")
-                longitude = content.get("Longitude")
-                speed = content.get("Speed")
-                status = content.get("DisplayState")
-
-                if not timestamp:
-                    continue
-
-                cur.execute("""
-                    INSERT INTO vehicle_status_history (
-                        vehicle_id, timestamp, status, address, latitude, longitude, speed
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-                    ON CONFLICT DO NOTHING
-                """, (
-                    vehicle_id,
-                    timestamp,
-                    status,
-                    address,
-                    float(latitude or 0),
-                    float(longitude or 0),
-                    float(speed or 0)
-                ))
-        conn.commit()
-        print("✅ Vehicle location history synced successfully.")
+    print(f"✅ {count} new vehicle positions synced successfully.")
 
 
 
 if __name__ == "__main__":
-    sync_jobs()
-    sync_job_assignments()
-    sync_vehicle_status_history()
+    with DimensionCache() as dims:
+        sync_jobs()
+        remove_deleted_jobs()
+        sync_job_assignments(dims=dims)
+        sync_vehicle_status_history(dims=dims)
@@ -1,4 +1,4 @@
-import requests
+from http_client import get_session
 import base64
 import jwt
 # ============================
@@ -38,7 +38,7 @@ def get_bearer_token():
         "Accept": "application/json"
     }
 
-    response = requests.get(TOKEN_URL, headers=headers)
+    response = get_session().get(TOKEN_URL, headers=headers)
 
     # Print raw response for debugging
     print("🔍 Response Status Code for Bearer Token:", response.status_code)
@@ -78,7 +78,7 @@ def get_vehicles(access_token):
     data = ["NS02", "NS05", "NS06", "NS07", "NS08", "NS09", "NS10", "NS21"] 
     
     # Send request
-    response = requests.post(TEST_URL, headers=headers, json=data)
+    response = get_session().post(TEST_URL, headers=headers, json=data)
 
     # Debug output
     print("🔍 Response Status Code for Vehicles:", response.status_code)
@@ -98,21 +98,31 @@ def get_vehicles(access_token):
 
 import json
 
-if __name__ == "__main__":
-    access_token = get_bearer_token()
-
-    if access_token:
-        vehicles = get_vehicles(access_token)
-        if vehicles:
-            try:
-                data = json.loads(vehicles)
-                with open("json/truck_location.json", "w") as f:
-                    json.dump(data, f, indent=2)
-                print("✅ Saved vehicle data to truck_location.json")
-            except json.JSONDecodeError:
-                print("❌ Response was not valid JSON.")
-
+TRUCK_LOCATION_PATH = "json/truck_location.json"
 
+def run():
+    """
+    Fetch vehicle locations and save them to truck_location.json.
+    Returns the parsed records; raises if the API call fails.
+    """
+    access_token = get_bearer_token()
+    if not access_token:
+        raise Exception("could not get a Verizon Connect token")
 
+    vehicles = get_vehicles(access_token)
+    if not vehicles:
+        raise Exception("could not get vehicle locations")
 
+    data = json.loads(vehicles)
+    with open(TRUCK_LOCATION_PATH, "w") as f:
+        json.dump(data, f, indent=2)
+    print("✅ Saved vehicle data to truck_location.json")
+    return data
 
+if __name__ == "__main__":
+    try:
+        run()
+    except json.JSONDecodeError:
+        print("❌ Response was not valid JSON.")
+    except Exception as e:
+        print(f"❌ {e}")
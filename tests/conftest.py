@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The scripts import each other by bare module name from their own directories
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+for folder in ("app", "database"):
+    sys.path.insert(0, os.path.join(ROOT, folder))
@@ -0,0 +1,72 @@
+import random
+
+import numpy as np
+import pytest
+from scipy.optimize import linear_sum_assignment
+
+from fleet_assignment import AUCTION_EPSILON, auction
+
+
+def random_instance(rng, num_bidders, num_objects, density, integer=False):
+    bidder_objects, bidder_values = [], []
+    for _ in range(num_bidders):
+        objects = [obj for obj in range(num_objects) if rng.random() < density]
+        bidder_objects.append(objects)
+        if integer:
+            bidder_values.append([float(rng.randint(1, 60)) for _ in objects])
+        else:
+            bidder_values.append([rng.uniform(0.1, 60.0) for _ in objects])
+    return bidder_objects, bidder_values
+
+
+def optimal_value(bidder_objects, bidder_values, num_objects):
+    # A pair a bidder can't take is worth 0, the same as leaving it unassigned
+    values = np.zeros((len(bidder_objects), num_objects))
+    for bidder, (objects, worth) in enumerate(zip(bidder_objects, bidder_values)):
+        values[bidder, objects] = worth
+    rows, cols = linear_sum_assignment(values, maximize=True)
+    return values[rows, cols].sum()
+
+
+def assignment_value(assignment, bidder_objects, bidder_values):
+    taken = [obj for obj in assignment if obj != -1]
+    assert len(taken) == len(set(taken)), "object assigned twice"
+
+    total = 0.0
+    for bidder, obj in enumerate(assignment):
+        if obj != -1:
+            total += bidder_values[bidder][bidder_objects[bidder].index(obj)]
+    return total
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_auction_is_within_epsilon_of_optimal(seed):
+    rng = random.Random(seed)
+    num_bidders, num_objects = rng.randint(1, 15), rng.randint(1, 25)
+    bidder_objects, bidder_values = random_instance(rng, num_bidders, num_objects, rng.uniform(0.1, 0.9))
+
+    assignment = auction(bidder_objects, bidder_values, num_objects)
+
+    best = optimal_value(bidder_objects, bidder_values, num_objects)
+    got = assignment_value(assignment, bidder_objects, bidder_values)
+    assert got <= best + 1e-6
+    assert got >= best - (num_bidders + num_objects) * AUCTION_EPSILON - 1e-6
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_auction_is_optimal_for_integer_values(seed):
+    rng = random.Random(100 + seed)
+    num_bidders, num_objects = rng.randint(1, 10), rng.randint(1, 12)
+    bidder_objects, bidder_values = random_instance(rng, num_bidders, num_objects, 0.5, integer=True)
+
+    # Below 1 / (people in the square problem) epsilon scaling is exact on integers
+    epsilon = 1.0 / (num_bidders + num_objects + 1)
+    assignment = auction(bidder_objects, bidder_values, num_objects, epsilon=epsilon)
+
+    best = optimal_value(bidder_objects, bidder_values, num_objects)
+    assert assignment_value(assignment, bidder_objects, bidder_values) == pytest.approx(best)
+
+
+def test_bidders_without_candidates_stay_unassigned():
+    assignment = auction([[], [0], []], [[], [5.0], []], 1)
+    assert assignment == [-1, 0, -1]
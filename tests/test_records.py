@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+import records
+
+DOCUMENT = {
+    "Schedule": [
+        {"Name": "J-1", "Bid Qty": "12.5", "Latitude": 43.0389, "Longitude": -87.9065, "Night?": "✅ Yes"},
+        {"Name": "J-2 \"east\"", "Bid Qty": "", "Latitude": -1.5e-3, "Longitude": 1e10, "Notes": "a, b: [c] {d}"},
+    ],
+    "Empty": [],
+    "Nested": [[1, 2.25, -3], {"deep": {"x": [True, False, None]}}, "ünïcødé \\ ☃"],
+    "Numbers": [0, 12345, 6.02e23, -0.0, 1E-7],
+}
+
+
+@pytest.fixture
+def json_file(tmp_path):
+    path = tmp_path / "doc.json"
+    path.write_text(json.dumps(DOCUMENT, indent=2, ensure_ascii=False))
+    return str(path)
+
+
+@pytest.fixture(params=[1, 7])
+def chunk_size(request, monkeypatch):
+    # Tiny chunks split every string, number and keyword across reads
+    monkeypatch.setattr(records, "STREAM_CHUNK_SIZE", request.param)
+    return request.param
+
+
+def test_depth_one_matches_json_load(json_file, chunk_size):
+    with open(json_file) as f:
+        expected = list(json.load(f).values())
+    assert list(records.iter_json(json_file, depth=1)) == expected
+
+
+def test_depth_two_matches_json_load(json_file, chunk_size):
+    with open(json_file) as f:
+        expected = [value for group in json.load(f).values() for value in group]
+    assert list(records.iter_json(json_file, depth=2)) == expected
+
+
+def test_top_level_array(tmp_path, chunk_size):
+    path = tmp_path / "trucks.json"
+    entries = [{"vehicle": "T1", "data": [{"Date": "2025-01-02"}]}, {"vehicle": "T2", "data": []}]
+    path.write_text(json.dumps(entries))
+    assert list(records.iter_json(str(path), depth=1)) == entries
+
+
+def test_truncated_file_raises(tmp_path, chunk_size):
+    path = tmp_path / "cut.json"
+    path.write_text(json.dumps(DOCUMENT)[:-20])
+    with pytest.raises(json.JSONDecodeError):
+        list(records.iter_json(str(path), depth=2))
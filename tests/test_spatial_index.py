@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from spatial_index import JobSpatialIndex, haversine_matrix
+
+
+@pytest.fixture
+def jobs():
+    rng = np.random.default_rng(7)
+    # Milwaukee-area spread plus a few far-away outliers
+    lats = np.concatenate([rng.normal(43.04, 0.4, 400), rng.uniform(25, 48, 20)])
+    lons = np.concatenate([rng.normal(-87.9, 0.4, 400), rng.uniform(-120, -70, 20)])
+    return lats, lons
+
+
+def brute_force(lats, lons, lat, lon):
+    return haversine_matrix([lat], [lon], lats, lons)[0]
+
+
+@pytest.mark.parametrize("miles", [0.5, 5, 25, 80, 3000])
+def test_within_radius_matches_brute_force(jobs, miles):
+    lats, lons = jobs
+    index = JobSpatialIndex(lats, lons)
+    for lat, lon in [(43.04, -87.9), (42.5, -88.6), (lats[3], lons[3]), (30.0, -100.0)]:
+        dists = brute_force(lats, lons, lat, lon)
+        ids, found = index.within_radius(lat, lon, miles)
+
+        assert set(ids) == set(np.flatnonzero(dists <= miles))
+        assert np.allclose(found, dists[ids])
+        assert np.all(np.diff(found) >= 0)
+
+
+@pytest.mark.parametrize("k", [1, 3, 10, 50, 1000])
+def test_k_nearest_matches_brute_force(jobs, k):
+    lats, lons = jobs
+    index = JobSpatialIndex(lats, lons)
+    for lat, lon in [(43.04, -87.9), (44.5, -89.0), (30.0, -100.0)]:
+        dists = brute_force(lats, lons, lat, lon)
+        ids, found = index.k_nearest(lat, lon, k)
+
+        expected = np.sort(dists)[:min(k, len(lats))]
+        assert len(ids) == len(expected)
+        assert np.allclose(found, expected)
+        assert np.allclose(dists[ids], found)
+
+
+def test_ids_map_back_to_caller_positions(jobs):
+    lats, lons = jobs
+    subset = np.arange(0, len(lats), 3)
+    index = JobSpatialIndex(lats[subset], lons[subset], ids=subset)
+
+    ids, _ = index.within_radius(43.04, -87.9, 30)
+    dists = brute_force(lats, lons, 43.04, -87.9)
+    assert set(ids) == {i for i in subset if dists[i] <= 30}
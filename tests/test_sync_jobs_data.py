@@ -0,0 +1,100 @@
+import json
+
+import psycopg2
+import pytest
+
+import records
+import sync_jobs_data
+from sync_jobs_data import CsvStream, copy_rows, vehicle_status_rows
+
+LOCATIONS = [
+    {
+        "VehicleNumber": f"T{n}",
+        "ContentResource": {"Value": {
+            "UpdateUTC": f"2025-01-02T08:{n:02d}:00",
+            "DisplayState": "Moving",
+            "Address": {"AddressLine1": f"{n} Main St"},
+            "Latitude": 43.0 + n / 100,
+            "Longitude": -87.9,
+            "Speed": 30
+        }}
+    }
+    for n in range(20)
+]
+
+
+class FakeDims:
+    def get(self, table, column, name):
+        return int(name[1:])
+
+
+class FakeCursor:
+    """Reads the COPY source the way psycopg2 does: an error in read() aborts the COPY."""
+
+    def __init__(self):
+        self.copied = ""
+
+    def copy_expert(self, sql, file):
+        try:
+            while True:
+                chunk = file.read(8192)
+                if not chunk:
+                    break
+                self.copied += chunk
+        except Exception as e:
+            raise psycopg2.extensions.QueryCanceledError(f"COPY from stdin failed: {e}")
+
+
+@pytest.fixture
+def truncated_file(tmp_path):
+    path = tmp_path / "truck_location.json"
+    path.write_text(json.dumps(LOCATIONS, indent=2)[:-40])
+    return str(path)
+
+
+def test_csv_stream_keeps_the_json_error(truncated_file):
+    stream = CsvStream(vehicle_status_rows(records.iter_json(truncated_file), FakeDims()))
+    with pytest.raises(json.JSONDecodeError):
+        stream.read(8192)
+    assert isinstance(stream.error, json.JSONDecodeError)
+
+
+def test_copy_rows_reraises_the_json_error(truncated_file):
+    rows = vehicle_status_rows(records.iter_json(truncated_file), FakeDims())
+    with pytest.raises(json.JSONDecodeError):
+        copy_rows(FakeCursor(), "staging_vehicle_status", sync_jobs_data.VEHICLE_STATUS_COLUMNS, rows)
+
+
+def test_copy_rows_streams_valid_file(tmp_path):
+    path = tmp_path / "truck_location.json"
+    path.write_text(json.dumps(LOCATIONS))
+    cur = FakeCursor()
+    copy_rows(cur, "staging_vehicle_status", sync_jobs_data.VEHICLE_STATUS_COLUMNS,
+              vehicle_status_rows(records.iter_json(str(path)), FakeDims()))
+
+    lines = cur.copied.splitlines()
+    assert len(lines) == len(LOCATIONS)
+    assert lines[3].startswith("3,2025-01-02 08:03:00+00:00,Moving,3 Main St,")
+
+
+def test_malformed_file_skips_vehicle_status_sync(truncated_file, monkeypatch, capsys):
+    class FakeConnection(FakeCursor):
+        """Connection and cursor in one; the with blocks just hand it back."""
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def cursor(self):
+            return self
+
+        def execute(self, *args):
+            pass
+
+    monkeypatch.setattr(sync_jobs_data, "TRUCK_LOC_PATH", truncated_file)
+    monkeypatch.setattr(psycopg2, "connect", lambda **params: FakeConnection())
+
+    sync_jobs_data.sync_vehicle_status_history(dims=FakeDims())
+    assert "not valid JSON" in capsys.readouterr().out
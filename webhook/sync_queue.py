@@ -0,0 +1,138 @@
+"""
+Coalescing work queue for webhook-triggered syncs.
+
+Events are collected for SYNC_DEBOUNCE_SECONDS after the first one arrives,
+then handled in a single run: repeated events for the same item collapse
+into one refresh, and any event that needs a full sync turns the whole batch
+into one sync_all_data.py run. Only one run happens at a time; events that
+arrive while it's busy are merged into the next run.
+"""
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+
+from fastapi.concurrency import run_in_threadpool
+
+import item_refresh
+
+SYNC_DEBOUNCE_SECONDS = float(os.getenv("SYNC_DEBOUNCE_SECONDS", 5))
+DATABASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "database")
+
+
+class SyncQueue:
+    def __init__(self, debounce_seconds=SYNC_DEBOUNCE_SECONDS):
+        self.debounce_seconds = debounce_seconds
+        self.pending_items = {}  # (board_id, item_id) -> latest event for it
+        self.full_sync_pending = False
+        self.running = False
+        self._wakeup = asyncio.Event()
+        self._worker = None
+        self.stats = {
+            "events_received": 0,
+            "events_coalesced": 0,
+            "runs": 0,
+            "full_syncs": 0,
+            "item_refreshes": 0,
+            "failed_runs": 0,
+            "last_run": None
+        }
+
+    def start(self):
+        self._worker = asyncio.create_task(self._run_forever())
+
+    def submit(self, event):
+        """Queue one parsed webhook event (see item_refresh.parse_event)."""
+        self.stats["events_received"] += 1
+        if self.full_sync_pending:
+            self.stats["events_coalesced"] += 1  # the pending full sync covers it
+        elif event["item_id"]:
+            key = (event["board_id"], event["item_id"])
+            if key in self.pending_items:
+                self.stats["events_coalesced"] += 1
+            self.pending_items[key] = event
+        else:
+            self.request_full_sync()
+        self._wakeup.set()
+
+    def request_full_sync(self):
+        # A full sync covers every pending item refresh
+        self.stats["events_coalesced"] += len(self.pending_items)
+        self.pending_items.clear()
+        self.full_sync_pending = True
+        self._wakeup.set()
+
+    def status(self):
+        return {
+            "queue_depth": len(self.pending_items) + (1 if self.full_sync_pending else 0),
+            "pending_item_refreshes": len(self.pending_items),
+            "full_sync_pending": self.full_sync_pending,
+            "running": self.running,
+            "debounce_seconds": self.debounce_seconds,
+            **self.stats
+        }
+
+    async def _run_forever(self):
+        while True:
+            await self._wakeup.wait()
+            # Let the rest of a burst arrive before doing anything
+            await asyncio.sleep(self.debounce_seconds)
+            self._wakeup.clear()
+
+            events = list(self.pending_items.values())
+            full_sync = self.full_sync_pending
+            self.pending_items = {}
+            self.full_sync_pending = False
+            if not events and not full_sync:
+                continue
+
+            self.running = True
+            started = time.perf_counter()
+            error = None
+            try:
+                if not full_sync:
+                    full_sync = not await self._refresh_items(events)
+                if full_sync:
+                    await self._full_sync()
+            except Exception as e:
+                error = str(e)
+                print(f"❌ Queued sync failed: {e}")
+            finally:
+                self.running = False
+
+            duration = time.perf_counter() - started
+            self.stats["runs"] += 1
+            if error:
+                self.stats["failed_runs"] += 1
+            self.stats["last_run"] = {
+                "finished_at": datetime.now().isoformat(timespec="seconds"),
+                "kind": "full" if full_sync else "items",
+                "status": "failed" if error else "ok",
+                "error": error,
+                "events": len(events),
+                "duration_s": round(duration, 3)
+            }
+            if not error:
+                print(f"✅ Queued sync ({self.stats['last_run']['kind']}) finished in {duration:.2f}s")
+
+    async def _refresh_items(self, events):
+        """Refresh each item; False as soon as one of them needs a full sync."""
+        for event in events:
+            try:
+                refreshed = await run_in_threadpool(item_refresh.refresh_item, event)
+            except Exception as e:
+                print(f"⚠️ Item refresh failed, falling back to a full sync: {e}")
+                refreshed = False
+            if not refreshed:
+                return False
+            self.stats["item_refreshes"] += 1
+        return True
+
+    async def _full_sync(self):
+        """Run sync_all_data.py; raises if it exits non-zero (a crash or a failed stage)."""
+        self.stats["full_syncs"] += 1
+        process = await asyncio.create_subprocess_exec(sys.executable, "sync_all_data.py", cwd=DATABASE_DIR)
+        returncode = await process.wait()
+        if returncode != 0:
+            raise Exception(f"sync_all_data.py exited with code {returncode}")
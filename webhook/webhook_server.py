@@ -1,8 +1,23 @@
 from fastapi import FastAPI, Request
-import subprocess
 import json
+import os
+import sys
 from datetime import datetime
+
+# Single-item refresh reuses the sync code in database/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "database"))
+import item_refresh
+from sync_queue import SyncQueue
+
 app = FastAPI()
+sync_queue = None
+
+@app.on_event("startup")
+async def start_sync_queue():
+    # Bursts of events collapse into one run; at most one sync runs at a time
+    global sync_queue
+    sync_queue = SyncQueue()
+    sync_queue.start()
 
 @app.get("/")
 def root():
@@ -21,14 +36,16 @@ async def webhook(request: Request):
         print("📬 Webhook received:")
         print(json.dumps(payload, indent=2))
 
-        # Optional: Trigger your sync job
-        subprocess.Popen(["python", "sync_all_data.py"], cwd="../database")
-        #give a time stamp
-        print(f"✅ Webhook received at {datetime.now()}")
-        return {"status": "ok"}
+        # Queue the item refresh (or a full sync for structural changes)
+        sync_queue.submit(item_refresh.parse_event(payload))
+        print(f"✅ Webhook queued at {datetime.now()}")
+        return {"status": "queued", **sync_queue.status()}
 
     except Exception as e:
         print(f"❌ Error in webhook: {e}")
         return {"error": str(e)}
 
-
+@app.get("/sync/status")
+def sync_status():
+    """Queue depth, whether a sync is running and how long the last one took."""
+    return sync_queue.status()